@@ -1,12 +1,14 @@
 import streamlit as st
 import time
-import queue
-import json
-import re
-import paho.mqtt.client as mqtt
-from streamlit_autorefresh import st_autorefresh
 import warnings
 
+from device_session import connected_device, init_state, mqtt_connect, publish, reset_flow, start_flow, tick
+from export_scheduler import get_scheduler
+from flow_engine import MISMATCH, VERIFIED, apply_flow, read_flow
+from inverter_protocol import DEVICE_TOPICS, unlock_command
+from log_viewer import render_response_log
+from register_catalog import REGISTERS
+
 warnings.filterwarnings("ignore")
 st.markdown(
     "[📄 View Zero Export Control Documentation](https://docs.google.com/document/d/19t-4g3MpZiy0W-6FyBcOZS9UOEp6_FumMR7E_fBK4PU/edit?usp=sharing)"
@@ -14,303 +16,43 @@ st.markdown(
 
 st.set_page_config("Solax Zero Export Control", layout="centered")
 
-MQTT_BROKER = "ecozen.ai"
-MQTT_PORT = 1883
-
-AUTO_REFRESH_MS = 500
-MAX_LOG_LINES = 100
-TIMEOUT = 6
-
-TOPIC_PREFIX = "EZMCOGX"
-DEVICE_TOPICS = [f"{TOPIC_PREFIX}{i:06d}" for i in range(1, 301)]
+CT = REGISTERS["ct_power"]
+EXPORT = REGISTERS["export_limit"]
 
 # =====================================================
 # SESSION STATE INIT
 # =====================================================
-def init_state():
-    defaults = {
-        # mqtt
-        "mqtt_client": None,
-        "rx_queue": queue.Queue(),
-
-        # connection
-        "state": "IDLE",     # IDLE | CONNECTING | CONNECTED | READ_CT | READ_EXPORT | ENABLE | DISABLE
-        "command_topic": None,
-
-        # data
-        "ct_power": None,
-        "export_limit": None,
-
-        # parsing
-        "pending_register": None,
-        "pending_since": None,
-        "parsed_payloads": set(),
-
-        # logs
-        "response_log": [],
-        "parse_debug": [],
-
-        # validation
-        "expected_export_value": None,
-
-        # write
-        "write_mode": None,          # "enable" | "disable"
-        "write_password": "",
-        "write_unlocked": False,
-        "write_value": None,
-        "lock_sent_at": None,
-        "response_cursor": 0
-    }
-
-    for k, v in defaults.items():
-        if k not in st.session_state:
-            st.session_state[k] = v
-
-
-init_state()
-# =====================================================
-# MQTT SETUP
-# =====================================================
-def mqtt_connect(device_id):
-    if st.session_state.mqtt_client:
-        return
-
-    cmd = f"/AC/5/{device_id}/Command"
-    rsp = f"/AC/5/{device_id}/Response"
-
-    rx_queue = st.session_state.rx_queue  # 👈 capture once
-
-    client = mqtt.Client()
-
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            client.subscribe(rsp)
-            rx_queue.put(("CONNECTED", None))  # ✅ SAFE
-
-    def on_message(client, userdata, msg):
-        rx_queue.put(("MSG", msg.payload.decode(errors="ignore")))  # ✅ SAFE
-
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
-
-    st.session_state.mqtt_client = client
-    st.session_state.command_topic = cmd
-    st.session_state.state = "CONNECTING"
-
-def publish(cmd):
-    # 🔍 DEBUG: log every outgoing command
-    ts = time.time()
-    st.session_state.parse_debug.append(f"📤 [{ts:.3f}] SENT → {cmd}")
-
-    st.session_state.mqtt_client.publish(
-        st.session_state.command_topic,
-        cmd,
-        qos=1
-    )
+init_state(ct_power=None, export_limit=None)
 
+# 🕘 zero-export policies run in the background for the whole process
+get_scheduler()
 
 # =====================================================
-# RX QUEUE DRAIN
+# FLOW OUTCOMES
 # =====================================================
-def drain_rx_queue():
-    while not st.session_state.rx_queue.empty():
-        event, payload = st.session_state.rx_queue.get()
+def on_flow_done(run):
+    if CT.name in run.results:
+        st.session_state.ct_power = run.results[CT.name]
 
-        if event == "CONNECTED":
-            st.session_state.state = "CONNECTED"
+    # =====================================================
+    # VERIFY EXPORT (SINGLE READ ONLY)
+    # =====================================================
+    if run.flow is apply_flow(EXPORT.name):
+        if run.outcome == VERIFIED:
+            st.session_state.export_limit = run.value
+            st.success(f"✅ Export limit successfully set to {run.value} W")
+        elif run.outcome == MISMATCH:
+            st.error(f"❌ Export verification failed. {run.reason}")
 
-        elif event == "MSG":
-            st.session_state.response_log.append((time.time(), payload))
-            st.session_state.response_log = st.session_state.response_log[-MAX_LOG_LINES:]
-
-# =====================================================
-# RESPONSE PARSING
-# =====================================================
-def extract_register(payload, register):
-    dbg = st.session_state.parse_debug
-
-    dbg.append("---- PAYLOAD ----")
-    dbg.append(payload)
-
-    try:
-        rsp = json.loads(payload).get("rsp", "")
-        dbg.append("JSON OK")
-    except Exception:
-        m = re.search(r'"rsp"\s*:\s*"([\s\S]*)"\s*}', payload)
-        if not m:
-            dbg.append("No rsp")
-            return None
-        rsp = m.group(1)
-
-    if "READ PROCESSING" in rsp:
-        dbg.append("Processing → ignore")
-        return None
-
-    for line in rsp.splitlines():
-        if line.startswith(f"{register}:"):
-            val = int(line.split(":")[1])
-            dbg.append(f"FOUND {register}={val}")
-            return val
-
-    return None
-
-def is_up_processed(payload: str) -> bool:
-    try:
-        rsp = json.loads(payload).get("rsp", "")
-    except Exception:
-        return False
-    return "UP PROCESSED" in rsp
-# =====================================================
-# EVENT-DRIVEN PARSER
-# =====================================================
-def run_state_machine():
-    if (
-        not st.session_state.pending_register
-        and st.session_state.state not in (
-            "WAIT_UP_PROCESSED",
-            "VERIFY_EXPORT_DELAY",
-        )
-    ):
-        return
-
-    # ⏱ timeout guard
-    if time.time() - st.session_state.pending_since > TIMEOUT:
-        if st.session_state.state == "WAIT_UP_PROCESSED":
-            st.session_state.parse_debug.append("⏱ TIMEOUT waiting for UP PROCESSED")
-        else:
-            st.session_state.parse_debug.append("⏱ TIMEOUT waiting for register")
-    
-        st.session_state.pending_register = None
-        st.session_state.state = "CONNECTED"
-        st.session_state.parsed_payloads.clear()
-        return
-
-    if st.session_state.state == "VERIFY_EXPORT_DELAY":
-        if time.time() < st.session_state.verify_at:
-            return
-    
-        publish("READ03**12345##1234567890,0802")
-        st.session_state.state = "VERIFY_EXPORT_ONCE"
-        st.session_state.pending_register = "0802"
-        st.session_state.pending_since = time.time()
-        st.session_state.parsed_payloads.clear()
-        return
-
-    for ts, payload in st.session_state.response_log[st.session_state.response_cursor:]:
-        st.session_state.response_cursor += 1  # ✅ advance once per payload
-    
-        if payload in st.session_state.parsed_payloads:
-            continue
-    
-        st.session_state.parsed_payloads.add(payload)
-
-        # =====================================================
-        # WAIT FOR *FINAL* UP PROCESSED (after LOCK)
-        # =====================================================
-        if st.session_state.state == "WAIT_UP_PROCESSED":
-
-            if ts < st.session_state.lock_sent_at:
-                continue
-        
-            if is_up_processed(payload):
-                st.session_state.parse_debug.append(
-                    "🔐 Final UP PROCESSED received → settling before verify"
-                )
-            
-                st.session_state.verify_at = time.time() + 0.8
-                st.session_state.state = "VERIFY_EXPORT_DELAY"
-                st.session_state.parsed_payloads.clear()
-                break        
-            continue
-    
-        # =====================================================
-        # REGISTER-BASED STATES
-        # =====================================================
-        value = extract_register(payload, st.session_state.pending_register)
-        if value is None:
-            continue
-
-        # =====================================================
-        # UPDATE FLOW
-        # =====================================================
-        if st.session_state.state == "UPDATE_CT":
-            st.session_state.ct_power = value
-
-            publish("READ03**12345##1234567890,0802")
-            st.session_state.pending_register = "0802"
-            st.session_state.pending_since = time.time()
-            st.session_state.state = "UPDATE_EXPORT"
-            st.session_state.parsed_payloads.clear()
-            break
-
-        elif st.session_state.state == "UPDATE_EXPORT":
-            st.session_state.export_limit = value
-
-            st.session_state.pending_register = None
-            st.session_state.state = "CONNECTED"
-            st.session_state.parsed_payloads.clear()
-            break
-
-        # =====================================================
-        # VERIFY EXPORT (SINGLE READ ONLY)
-        # =====================================================
-        # elif st.session_state.state == "VERIFY_EXPORT_ONCE":
-        
-        #     if value == st.session_state.write_value:
-        #         st.session_state.export_limit = value
-        #         st.success("Export limit updated successfully")
-        
-        #     else:
-        #         st.error(
-        #             f"Export verification failed. "
-        #             f"Expected {st.session_state.write_value}, got {value}"
-        #         )
-        
-        #     # ✅ End verification — no retries
-        #     st.session_state.state = "CONNECTED"
-        #     st.session_state.pending_register = None
-        #     st.session_state.write_unlocked = False
-        #     st.session_state.write_value = None
-        #     st.session_state.parsed_payloads.clear()
-        #     break
-        elif st.session_state.state == "VERIFY_EXPORT_ONCE":
-
-            if value == st.session_state.write_value:
-                st.session_state.export_limit = value
-        
-                st.success(
-                    f"✅ Export limit successfully set to {value} W"
-                )
-        
-                st.session_state.parse_debug.append(
-                    f"✔ Verification success: 0802={value}"
-                )
-        
-            else:
-                st.error(
-                    f"❌ Export verification failed. "
-                    f"Expected {st.session_state.write_value}, got {value}"
-                )
-        
-                st.session_state.parse_debug.append(
-                    f"✖ Verification failed: expected {st.session_state.write_value}, got {value}"
-                )
-        
+        if run.outcome in (VERIFIED, MISMATCH):
             # ✅ End verification — no retries
-            st.session_state.state = "CONNECTED"
-            st.session_state.pending_register = None
             st.session_state.write_unlocked = False
             st.session_state.write_value = None
-            st.session_state.parsed_payloads.clear()
-            break
 
-            
-if st.session_state.mqtt_client:
-    st_autorefresh(interval=AUTO_REFRESH_MS, key="mqtt_refresh")
-    drain_rx_queue()
-    run_state_machine()
+    elif EXPORT.name in run.results:
+        st.session_state.export_limit = run.results[EXPORT.name]
+
+tick(on_flow_done)
 
 # =====================================================
 # UI
@@ -319,7 +61,8 @@ st.title("🔌 Solax Inverter – Zero Export Control")
 
 device = st.selectbox("Select Device", DEVICE_TOPICS)
 
-if st.button("Connect", disabled=st.session_state.state != "IDLE"):
+# switching device releases the previous hub
+if st.button("Connect", disabled=connected_device() == device):
     mqtt_connect(device)
 
 if st.session_state.state in ("CONNECTING", "IDLE"):
@@ -330,12 +73,7 @@ else:
 # =====================================================
 # DEBUG
 # =====================================================
-with st.expander("📡 Raw MQTT Responses"):
-    st.text_area(
-        "Responses",
-        value="\n\n---\n\n".join(p for _, p in st.session_state.response_log),
-        height=300
-    )
+render_response_log()
 
 with st.expander("🧪 Parsing Debug Trace"):
     st.text_area(
@@ -352,13 +90,7 @@ st.subheader("Inverter Settings")
 
 if st.button("Update", disabled=st.session_state.state != "CONNECTED"):
     st.session_state.parse_debug.clear()
-    st.session_state.parsed_payloads.clear()
-    st.session_state.response_cursor = len(st.session_state.response_log)
-
-    publish("READ04**12345##1234567890,1032")
-    st.session_state.pending_register = "1032"
-    st.session_state.pending_since = time.time()
-    st.session_state.state = "UPDATE_CT"
+    start_flow(read_flow(CT.name, EXPORT.name), on_flow_done)
 
 ct_enabled = "Yes" if st.session_state.ct_power not in (None, 0) else "No"
 
@@ -369,6 +101,16 @@ st.text_input(
     disabled=True
 )
 
+# 👥 latest values seen by any session on this device
+hub = st.session_state.mqtt_client
+if hub:
+    shared = [
+        f"{reg}={hub.latest[reg][0]} @ {time.strftime('%H:%M:%S', time.localtime(hub.latest[reg][1]))}"
+        for reg in (CT.read, EXPORT.read)
+        if reg in hub.latest
+    ]
+    st.caption(f"👥 {hub.viewers} viewer(s) · " + (" · ".join(shared) or "no shared reads yet"))
+
 # =====================================================
 # ZERO EXPORT CONTROL
 # =====================================================
@@ -394,10 +136,7 @@ def start_write_flow(mode):
     st.session_state.write_unlocked = False
 
     # 🔥 HARD RESET of read pipeline
-    st.session_state.pending_register = None
-    st.session_state.pending_since = None
-    st.session_state.parsed_payloads.clear()
-    st.session_state.response_cursor = len(st.session_state.response_log)
+    reset_flow()
 
     st.session_state.state = "WRITE_PASSWORD"
 
@@ -416,7 +155,7 @@ if st.session_state.state == "WRITE_PASSWORD":
         padded = pwd.zfill(5)
         st.session_state.write_password = padded
 
-        publish(f"UP#,1536:{padded}")
+        publish(unlock_command(padded))
 
         if padded == "02014":
             st.session_state.write_unlocked = True
@@ -435,39 +174,30 @@ if st.session_state.state == "WRITE_VALUE" and st.session_state.write_unlocked:
         st.info("Zero export enabled → Export limit fixed to 1 W")
 
         if st.button("Set Export Limit"):
-            publish("UP#,1540:00001")
+            publish(EXPORT.write_command(1))
             st.session_state.state = "WRITE_LOCK"
 
     # DISABLE → user chooses value
     else:
         value = st.number_input(
             "Export Limit (W)",
-            min_value=1,
-            max_value=61000,
+            min_value=EXPORT.min,
+            max_value=EXPORT.max,
             value=10000
         )
 
         if st.button("Set Export Limit"):
-            padded_val = f"{value:05d}"
             st.session_state.write_value = value
 
-            publish(f"UP#,1540:{padded_val}")
+            publish(EXPORT.write_command(value))
             st.session_state.state = "WRITE_LOCK"
 # -------------- LOCK ---------------------------------------
 if st.session_state.state == "WRITE_LOCK":
     st.subheader("🔒 Lock Settings")
 
     if st.button("Lock & Apply"):
-        lock_ts = time.time()
-        publish("UP#,1536:00001")
-
-        st.session_state.lock_sent_at = lock_ts          
-        st.session_state.state = "WAIT_UP_PROCESSED"
-        st.session_state.pending_register = None
-        st.session_state.pending_since = lock_ts
-
-        st.session_state.parsed_payloads.clear()
-        st.session_state.response_cursor = len(st.session_state.response_log)
+        # lock → final UP PROCESSED → settle → verify, driven by run_flow()
+        start_flow(apply_flow(EXPORT.name), on_flow_done, value=st.session_state.write_value)
 
 
 
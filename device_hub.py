@@ -0,0 +1,173 @@
+import threading
+import time
+import weakref
+
+from inverter_protocol import device_address, parse_registers, read_register_of
+from traffic_recorder import RX, TX, record as record_traffic
+
+READ_MERGE_WINDOW = 6   # same as flow_engine.TIMEOUT
+
+
+# =====================================================
+# DEVICE HUB
+# =====================================================
+class DeviceHub:
+    """One MQTT subscription per device, shared by every session viewing it.
+
+    Sessions attach their `rx_queue`; each response is decoded once and put
+    on every attached queue. A READ that is already in flight (same command,
+    no answer yet, inside READ_MERGE_WINDOW) is not published again — the
+    pending answer reaches all viewers through the fan-out.
+    """
+
+    def __init__(self, device_id):
+        self.device_id = device_id      # label from DEVICE_TOPICS
+        self.broker, address = device_address(device_id)
+        self.command_topic = f"/AC/5/{address}/Command"
+        self.response_topic = f"/AC/5/{address}/Response"
+
+        self.connected = False
+        self.latest = {}      # register -> (value, ts)
+
+        self._subscribers = weakref.WeakSet()
+        self._inflight = {}   # read cmd -> sent_at
+        self._lock = threading.Lock()
+        self._client = None
+
+    # -------------------------------------------------
+    # sessions
+    # -------------------------------------------------
+    def attach(self, rx_queue):
+        with self._lock:
+            self._subscribers.add(rx_queue)
+            connected = self.connected
+            if self._client is None:
+                self._start()
+
+        if connected:
+            rx_queue.put(("CONNECTED", None))
+
+    def detach(self, rx_queue):
+        with self._lock:
+            self._subscribers.discard(rx_queue)
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    def _fan_out(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            q.put(event)
+
+    # -------------------------------------------------
+    # mqtt
+    # -------------------------------------------------
+    def _start(self):
+        import paho.mqtt.client as mqtt
+
+        client = mqtt.Client()
+
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                client.subscribe(self.response_topic)
+                self.connected = True
+                self._fan_out(("CONNECTED", None))
+
+        def on_disconnect(client, userdata, rc):
+            self.connected = False
+
+        def on_message(client, userdata, msg):
+            record_traffic(RX, msg.topic, msg.payload)
+            self._on_payload(msg.payload.decode(errors="ignore"))
+
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
+        # async so attaching never blocks the registry on a slow broker
+        client.connect_async(self.broker["host"], self.broker["port"], 60)
+        client.loop_start()
+
+        self._client = client
+
+    def stop(self):
+        with self._lock:
+            client, self._client = self._client, None
+            self.connected = False
+        if client is not None:
+            client.loop_stop()
+            client.disconnect()
+
+    def _on_payload(self, payload):
+        ts = time.time()
+        values = parse_registers(payload)
+
+        if values:
+            with self._lock:
+                for register, value in values.items():
+                    self.latest[register] = (value, ts)
+                self._inflight = {
+                    cmd: sent
+                    for cmd, sent in self._inflight.items()
+                    if read_register_of(cmd) not in values
+                }
+
+        self._fan_out(("MSG", payload))
+
+    def publish(self, cmd):
+        """Publish `cmd`; returns False if merged into an in-flight read."""
+        now = time.time()
+
+        if read_register_of(cmd) is not None:
+            with self._lock:
+                sent = self._inflight.get(cmd)
+                if sent is not None and now - sent < READ_MERGE_WINDOW:
+                    return False
+                self._inflight[cmd] = now
+        else:
+            # a write changes what the device will answer; never merge a
+            # read issued after it into one issued before it
+            with self._lock:
+                self._inflight.clear()
+
+        record_traffic(TX, self.command_topic, cmd)
+        self._client.publish(self.command_topic, cmd, qos=1)
+        return True
+
+
+# =====================================================
+# PROCESS-WIDE REGISTRY
+# =====================================================
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+
+def _reap():
+    # sessions that ended without detaching drop out of the WeakSets
+    for device_id, hub in list(_hubs.items()):
+        if hub.viewers == 0:
+            hub.stop()
+            del _hubs[device_id]
+
+
+def attach_hub(device_id, rx_queue):
+    """Shared hub for `device_id`, with `rx_queue` attached to it."""
+    with _hubs_lock:
+        hub = _hubs.get(device_id)
+        if hub is None:
+            hub = _hubs[device_id] = DeviceHub(device_id)
+        hub.attach(rx_queue)
+        _reap()
+        return hub
+
+
+def release_hub(hub, rx_queue):
+    """Detach a session; the last viewer leaving closes the connection."""
+    with _hubs_lock:
+        hub.detach(rx_queue)
+        if hub.viewers == 0:
+            hub.stop()
+            if _hubs.get(hub.device_id) is hub:
+                del _hubs[hub.device_id]
+        _reap()
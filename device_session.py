@@ -0,0 +1,162 @@
+import queue
+import time
+
+import streamlit as st
+
+from device_hub import attach_hub, release_hub
+from flow_engine import FlowRun
+
+AUTO_REFRESH_MS = 500
+MAX_LOG_LINES = 100
+
+# callables are factories, only run for a new session
+SESSION_DEFAULTS = {
+    # mqtt
+    "mqtt_client": None,
+    "rx_queue": queue.Queue,
+
+    # connection
+    "state": "IDLE",             # IDLE | CONNECTING | CONNECTED | <flow name> | WRITE_*
+    "command_topic": None,
+
+    # parsing
+    "flow": None,                # FlowRun in progress
+
+    # logs
+    "response_log": list,
+    "parse_debug": list,
+
+    # write
+    "write_mode": None,
+    "write_password": "",
+    "write_unlocked": False,
+    "write_value": None,
+    "response_cursor": 0,        # response_seq already fed to the flow
+    "response_seq": 0,
+}
+
+
+# =====================================================
+# SESSION STATE INIT
+# =====================================================
+def init_state(**page_defaults):
+    """Seed the shared device-session keys plus the page's own ones."""
+    defaults = dict(SESSION_DEFAULTS, **page_defaults)
+
+    for k, v in defaults.items():
+        if k not in st.session_state:
+            st.session_state[k] = v() if callable(v) else v
+
+    # per-device values, cleared when the session switches device
+    st.session_state.setdefault("device_keys", {}).update(page_defaults)
+
+
+# =====================================================
+# MQTT SETUP
+# =====================================================
+def connected_device():
+    hub = st.session_state.mqtt_client
+    return hub.device_id if hub else None
+
+
+def mqtt_connect(device_id):
+    if connected_device() == device_id:
+        return
+
+    # 🔄 switching device → leave the old hub and drop its values
+    if st.session_state.mqtt_client:
+        release_hub(st.session_state.mqtt_client, st.session_state.rx_queue)
+        st.session_state.mqtt_client = None
+        st.session_state.rx_queue = queue.Queue()
+        reset_flow()
+        st.session_state.write_unlocked = False
+        st.session_state.write_value = None
+        for k, v in st.session_state.device_keys.items():
+            st.session_state[k] = v() if callable(v) else v
+
+    # 🔗 one shared subscription per device, fanned out to every session
+    hub = attach_hub(device_id, st.session_state.rx_queue)
+
+    st.session_state.mqtt_client = hub
+    st.session_state.command_topic = hub.command_topic
+    st.session_state.state = "CONNECTING"
+
+
+def publish(cmd):
+    # 🔍 DEBUG: log every outgoing command
+    ts = time.time()
+
+    if st.session_state.mqtt_client.publish(cmd):
+        st.session_state.parse_debug.append(f"📤 [{ts:.3f}] SENT → {cmd}")
+    else:
+        st.session_state.parse_debug.append(f"🔗 [{ts:.3f}] MERGED → {cmd} (already in flight)")
+
+
+# =====================================================
+# RX QUEUE DRAIN
+# =====================================================
+def drain_rx_queue():
+    while not st.session_state.rx_queue.empty():
+        event, payload = st.session_state.rx_queue.get()
+
+        if event == "CONNECTED":
+            st.session_state.state = "CONNECTED"
+
+        elif event == "MSG":
+            st.session_state.response_log.append((time.time(), payload))
+            st.session_state.response_seq += 1
+            st.session_state.response_log = st.session_state.response_log[-MAX_LOG_LINES:]
+
+
+# =====================================================
+# FLOW RUNNER
+# =====================================================
+def start_flow(flow, on_done, **kwargs):
+    st.session_state.flow = FlowRun(flow, **kwargs)
+    st.session_state.response_cursor = st.session_state.response_seq
+    st.session_state.state = flow.name
+    run_flow(on_done)
+
+
+def reset_flow():
+    """Drop any flow in progress and ignore responses received so far."""
+    st.session_state.flow = None
+    st.session_state.response_cursor = st.session_state.response_seq
+
+
+def run_flow(on_done):
+    """Feed new responses, publish what the flow asks for, and hand the
+    finished FlowRun to the page's `on_done(run)`."""
+    run = st.session_state.flow
+    if run is None:
+        return
+
+    # feed only responses that arrived since the last tick
+    new = st.session_state.response_seq - st.session_state.response_cursor
+    if new > 0:
+        for ts, payload in st.session_state.response_log[-new:]:
+            run.feed(ts, payload)
+    st.session_state.response_cursor = st.session_state.response_seq
+
+    for _, cmd in run.advance(time.time()):
+        publish(cmd)
+    st.session_state.parse_debug.extend(run.drain_log())
+
+    if not run.finished:
+        return
+
+    st.session_state.flow = None
+    st.session_state.state = "CONNECTED"
+    on_done(run)
+
+
+def tick(on_done, interval=AUTO_REFRESH_MS):
+    """Per-rerun loop of a connected page: refresh, drain, drive the flow."""
+    if not st.session_state.mqtt_client:
+        return
+
+    from streamlit_autorefresh import st_autorefresh
+
+    st_autorefresh(interval=interval, key="mqtt_refresh")
+    drain_rx_queue()
+    run_flow(on_done)
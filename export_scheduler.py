@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from write_jobs import create_job, get_job, list_journals, read_header
+
+SCHEDULE_DIR = "schedules"
+POLICY_FILE = os.path.join(SCHEDULE_DIR, "policies.json")
+RUNS_FILE = os.path.join(SCHEDULE_DIR, "runs.jsonl")
+
+TICK = 15                     # s between boundary checks
+MAX_CONCURRENT_WRITES = 16    # unlock→verify sequences in flight, all runs together
+WORKERS_PER_RUN = 8
+SPREAD = 60                   # s, device starts are staggered over this window
+MAX_RUNS = 50
+RETRY_BACKOFF = 60            # s after a run before its failed devices are retried, doubles per attempt
+MAX_BACKOFF = 900
+
+# unattended writes need the inverter password; without it the scheduler stays off
+PASSWORD_ENV = "CT_INVERTER_PASSWORD"
+PASSWORD = os.environ.get(PASSWORD_ENV)
+
+
+# =====================================================
+# POLICIES
+# =====================================================
+# {"groups": {"site-a": [...]},
+#  "policies": [{"name": "tariff", "group": "site-a" | "devices": [...],
+#                "windows": [{"start": "09:00", "end": "16:00", "value": 1}],
+#                "default": 10000, "enabled": true}]}
+def load_policies():
+    if not os.path.exists(POLICY_FILE):
+        return {"groups": {}, "policies": []}
+    with open(POLICY_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_policies(config):
+    os.makedirs(SCHEDULE_DIR, exist_ok=True)
+    tmp = POLICY_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp, POLICY_FILE)
+
+
+def _minutes(hhmm):
+    h, m = map(int, hhmm.split(":"))
+    return h * 60 + m
+
+
+def target_value(policy, now):
+    minute = now.hour * 60 + now.minute
+
+    for w in policy["windows"]:
+        start, end = _minutes(w["start"]), _minutes(w["end"])
+        if start <= end:
+            inside = start <= minute < end
+        else:                                   # crosses midnight
+            inside = minute >= start or minute < end
+        if inside:
+            return w["value"]
+
+    return policy["default"]
+
+
+def current_boundary(policy, now):
+    """Most recent window edge at or before `now`, or None without windows."""
+    edges = sorted({_minutes(w[k]) for w in policy["windows"] for k in ("start", "end")})
+    if not edges:
+        return None
+
+    minute = now.hour * 60 + now.minute
+    past = [e for e in edges if e <= minute]
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if past:
+        return day + timedelta(minutes=past[-1])
+    return day - timedelta(days=1) + timedelta(minutes=edges[-1])
+
+
+def policy_devices(config, policy):
+    if "group" in policy:
+        return config["groups"].get(policy["group"], [])
+    return policy.get("devices", [])
+
+
+def run_key(policy, now):
+    boundary = current_boundary(policy, now)
+    edge = boundary.isoformat(timespec="minutes") if boundary else "static"
+    return f"{policy['name']}@{edge}={target_value(policy, now)}"
+
+
+# =====================================================
+# SCHEDULER
+# =====================================================
+class ExportScheduler:
+    """Fires a bulk export-limit write whenever a policy's target changes.
+
+    Each (policy, boundary, value) is one BulkWriteJob tagged with that key,
+    so after a restart the job for the current window is found in the
+    journals and resumed instead of started again. A run still going when
+    the next boundary passes is stopped, and the new one starts only after
+    its in-flight devices are done. Devices that failed are resumed on a
+    later tick within the same window, with exponential backoff. All runs
+    share one semaphore, and device starts are spread over SPREAD seconds.
+    """
+
+    def __init__(self):
+        self.config = load_policies()
+        self.runs = deque(self._load_runs(), maxlen=MAX_RUNS)
+        self.enabled = bool(PASSWORD)
+        self.last_tick = None
+        self.last_error = None
+        self.last_error_at = None
+
+        self._limiter = threading.BoundedSemaphore(MAX_CONCURRENT_WRITES)
+        self._lock = threading.Lock()
+        self._attempts = {}     # run key -> runs started in this process
+        self._active = {}       # policy name -> job last started for it
+        self._journal_of = {}   # run key -> journal path
+
+        for path in list_journals():
+            header = read_header(path)
+            key = header and header.get("meta", {}).get("run_key")
+            if key:
+                self._journal_of.setdefault(key, path)
+
+        self._thread = threading.Thread(target=self._loop, name="export-scheduler", daemon=True)
+        if self.enabled:
+            self._thread.start()
+
+    # -------------------------------------------------
+    # config / reports
+    # -------------------------------------------------
+    def set_config(self, config):
+        save_policies(config)
+        with self._lock:
+            self.config = config
+
+    def _load_runs(self):
+        if not os.path.exists(RUNS_FILE):
+            return []
+        with open(RUNS_FILE, encoding="utf-8") as f:
+            return [json.loads(line) for line in deque(f, maxlen=MAX_RUNS)]
+
+    def _on_done(self, job):
+        report = job.report()
+        self.runs.append(report)
+        os.makedirs(SCHEDULE_DIR, exist_ok=True)
+        with open(RUNS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+
+    # -------------------------------------------------
+    # loop
+    # -------------------------------------------------
+    def _loop(self):
+        while True:
+            try:
+                self.tick(datetime.now())
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.last_error_at = datetime.now()
+            time.sleep(TICK)
+
+    def tick(self, now):
+        with self._lock:
+            config = self.config
+        self.last_tick = now
+
+        for policy in config["policies"]:
+            if not policy.get("enabled", True):
+                continue
+
+            key = run_key(policy, now)
+            attempts = self._attempts.get(key, 0)
+
+            # the previous boundary's run may still be writing the same
+            # devices with another value → stop it and start once it drained
+            active = self._active.get(policy["name"])
+            if active is not None and active.running and active.meta.get("run_key") != key:
+                active.stop(f"superseded by {key}")
+                continue
+
+            path = self._journal_of.get(key)
+            if path:
+                job = get_job(path)
+                if job.running or not job.pending():
+                    continue
+                # finished with failures → retry once the backoff has passed
+                backoff = min(RETRY_BACKOFF * 2 ** max(attempts - 1, 0), MAX_BACKOFF)
+                if job.finished_at and now.timestamp() - job.finished_at < backoff:
+                    continue
+            else:
+                devices = policy_devices(config, policy)
+                if not devices:
+                    continue
+                job = create_job(
+                    "export_limit",
+                    target_value(policy, now),
+                    devices,
+                    policy=policy["name"],
+                    run_key=key,
+                )
+                self._journal_of[key] = job.path
+
+            self._attempts[key] = attempts + 1
+            self._active[policy["name"]] = job
+            job.start(
+                PASSWORD,
+                max_workers=WORKERS_PER_RUN,
+                spread=SPREAD,
+                limiter=self._limiter,
+                on_done=self._on_done,
+            )
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExportScheduler()
+        return _scheduler
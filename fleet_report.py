@@ -0,0 +1,245 @@
+import io
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+
+READING_COLUMNS = [
+    "device", "ct_power", "export_limit", "voltage_high", "voltage_low", "last_seen", "latency_s",
+]
+WRITE_COLUMNS = ["job", "device", "setting", "target", "step", "value", "reason", "ts"]
+
+SHEETS_BATCH_ROWS = 500
+
+# Google Sheets push is enabled when both are set
+SHEETS_KEY_ENV = "CT_SHEETS_KEY"
+SHEETS_CREDENTIALS_ENV = "CT_SHEETS_CREDENTIALS"
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _a1_row(cell):
+    from openpyxl.utils.cell import coordinate_from_string
+
+    return coordinate_from_string(cell)[1]
+
+
+def _timestamp(ts):
+    if ts is None or (isinstance(ts, float) and math.isnan(ts)):
+        return None
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+# =====================================================
+# ROW SOURCES (generators, nothing held in memory)
+# =====================================================
+def fleet_rows(table):
+    """Latest readings per device from a FleetTable."""
+    from fleet_table import COL
+
+    for i, device in enumerate(list(table.devices)):
+        values = table.values[i]
+        yield [
+            device,
+            _cell(float(values[COL["ct_power"]])),
+            _cell(float(values[COL["export_limit"]])),
+            _cell(float(values[COL["voltage_high"]])),
+            _cell(float(values[COL["voltage_low"]])),
+            _timestamp(float(table.last_seen[i])),
+            _cell(float(table.latency[i])),
+        ]
+
+
+def job_rows(job):
+    """Write/verify outcome per device from a BulkWriteJob."""
+    for device in job.devices:
+        detail = job.details.get(device, {})
+        yield [
+            job.job_id,
+            device,
+            job.setting,
+            job.value,
+            job.status.get(device, "PENDING"),
+            detail.get("value"),
+            detail.get("reason"),
+            _timestamp(detail.get("ts")),
+        ]
+
+
+# =====================================================
+# EXCEL (openpyxl write-only → constant memory)
+# =====================================================
+class ExcelReport:
+    def __init__(self):
+        # openpyxl is only loaded once a report is actually built
+        from openpyxl import Workbook
+
+        self._wb = Workbook(write_only=True)
+        self._sheets = {}
+
+    def sheet(self, title, header):
+        if title not in self._sheets:
+            ws = self._wb.create_sheet(title)
+            ws.append(header)
+            self._sheets[title] = ws
+        return self._sheets[title]
+
+    def append(self, title, header, row):
+        self.sheet(title, header).append(row)
+
+    def save(self, target=None):
+        """Save to a path or, with no target, return the workbook bytes."""
+        if target is not None:
+            self._wb.save(target)
+            return target
+        buf = io.BytesIO()
+        self._wb.save(buf)
+        return buf.getvalue()
+
+
+# =====================================================
+# GOOGLE SHEETS (batched range updates)
+# =====================================================
+class SheetsSink(ABC):
+    """Where batched rows go; lets a local fake replace Google Sheets."""
+
+    @abstractmethod
+    def prepare(self, sheet, columns):
+        """Create or clear `sheet` for a new export."""
+
+    @abstractmethod
+    def batch_update(self, sheet, updates):
+        """Write [(a1_range, rows), ...] in a single request."""
+
+
+class GspreadSink(SheetsSink):
+    def __init__(self, credentials_file, spreadsheet_key):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        scope = [
+            "https://spreadsheets.google.com/feeds",
+            "https://www.googleapis.com/auth/drive",
+        ]
+        creds = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, scope)
+        self._spreadsheet = gspread.authorize(creds).open_by_key(spreadsheet_key)
+        self._worksheets = {}
+
+    def prepare(self, sheet, columns):
+        import gspread
+
+        try:
+            ws = self._spreadsheet.worksheet(sheet)
+            ws.clear()
+        except gspread.WorksheetNotFound:
+            ws = self._spreadsheet.add_worksheet(sheet, rows=SHEETS_BATCH_ROWS, cols=columns)
+        self._worksheets[sheet] = ws
+
+    def batch_update(self, sheet, updates):
+        ws = self._worksheets[sheet]
+
+        # the values API rejects ranges past the grid, so grow it first
+        last_row = max(_a1_row(a1.split(":")[1]) for a1, _ in updates)
+        if last_row > ws.row_count:
+            ws.add_rows(max(last_row - ws.row_count, SHEETS_BATCH_ROWS))
+
+        self._spreadsheet.values_batch_update({
+            "valueInputOption": "RAW",
+            "data": [{"range": f"'{sheet}'!{a1}", "values": rows} for a1, rows in updates],
+        })
+
+
+def sheets_sink_from_env():
+    key = os.environ.get(SHEETS_KEY_ENV)
+    credentials = os.environ.get(SHEETS_CREDENTIALS_ENV)
+    if not key or not credentials:
+        return None
+    return GspreadSink(credentials, key)
+
+
+class InMemorySheets(SheetsSink):
+    """Local stand-in for GspreadSink: keeps cells and counts requests."""
+
+    def __init__(self):
+        self.sheets = {}
+        self.requests = 0
+
+    def prepare(self, sheet, columns):
+        self.sheets[sheet] = []
+
+    def batch_update(self, sheet, updates):
+        self.requests += 1
+        rows = self.sheets[sheet]
+        for a1, values in updates:
+            start = _a1_row(a1.split(":")[0]) - 1
+            if len(rows) < start + len(values):
+                rows.extend([None] * (start + len(values) - len(rows)))
+            rows[start:start + len(values)] = values
+
+
+class BatchedSheetWriter:
+    """Buffers rows and ships them as one range update per batch."""
+
+    def __init__(self, sink, sheet, header, batch_rows=SHEETS_BATCH_ROWS):
+        self.sink = sink
+        self.sheet = sheet
+        self.width = len(header)
+        self.batch_rows = batch_rows
+
+        self._next_row = 1
+        self._buffer = [header]
+        sink.prepare(sheet, self.width)
+
+    def append(self, row):
+        self._buffer.append(["" if v is None else v for v in row])
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        from openpyxl.utils import get_column_letter
+
+        if not self._buffer:
+            return
+        first = self._next_row
+        last = first + len(self._buffer) - 1
+        a1 = f"A{first}:{get_column_letter(self.width)}{last}"
+        self.sink.batch_update(self.sheet, [(a1, self._buffer)])
+        self._next_row = last + 1
+        self._buffer = []
+
+
+# =====================================================
+# PIPELINE
+# =====================================================
+def export_report(readings=None, writes=None, excel=None, sheets_sink=None, batch_rows=SHEETS_BATCH_ROWS):
+    """Stream reading and write-outcome rows into an ExcelReport and/or a
+    SheetsSink in one pass. Returns the number of rows exported.
+
+    Sections left as None are skipped entirely, so pushing one of them
+    never clears the other's worksheet.
+    """
+    sections = [("Readings", READING_COLUMNS, readings), ("Writes", WRITE_COLUMNS, writes)]
+    count = 0
+
+    for title, header, rows in sections:
+        if rows is None:
+            continue
+        writer = BatchedSheetWriter(sheets_sink, title, header, batch_rows) if sheets_sink else None
+        if excel is not None:
+            excel.sheet(title, header)
+
+        for row in rows:
+            if excel is not None:
+                excel.append(title, header, row)
+            if writer is not None:
+                writer.append(row)
+            count += 1
+
+        if writer is not None:
+            writer.flush()
+
+    return count
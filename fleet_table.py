@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from inverter_protocol import BROKERS, DEVICE_TOPICS, device_label, parse_registers
+from register_catalog import REGISTERS
+
+
+# =====================================================
+# COLUMNS / POLICY
+# =====================================================
+# response address → column, straight from the register catalog
+REGISTER_COLUMNS = {r.read: r.name for r in REGISTERS.values()}
+COLUMNS = list(REGISTER_COLUMNS.values())
+COL = {name: i for i, name in enumerate(COLUMNS)}
+
+ZERO_EXPORT_MAX = 1          # W, what "Enable Zero Export" writes
+EXPORT_BINS = np.array([0, 2, 1000, 5000, 10000, 61001])
+EXPORT_BIN_LABELS = ["0–1", "2–999", "1k–5k", "5k–10k", "10k+"]
+STALE_AFTER = 300            # s
+
+DEFAULT_POLICY = {
+    "voltage_high": (230, 280),
+    "voltage_low": (160, 230),
+}
+
+# one voltage policy for the whole process, edited explicitly from the page
+POLICY_FILE = "fleet_policy.json"
+
+
+def load_policy():
+    if not os.path.exists(POLICY_FILE):
+        return dict(DEFAULT_POLICY)
+    with open(POLICY_FILE, encoding="utf-8") as f:
+        return {name: tuple(bounds) for name, bounds in json.load(f).items()}
+
+
+def save_policy(policy):
+    tmp = POLICY_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(policy, f, indent=2)
+    os.replace(tmp, POLICY_FILE)
+
+
+def _export_bins(values):
+    """Histogram bin per export limit, -1 where the value is unknown."""
+    values = np.asarray(values, dtype=np.float64)
+    bins = np.clip(np.searchsorted(EXPORT_BINS, values, side="right") - 1, 0, len(EXPORT_BIN_LABELS) - 1)
+    return np.where(np.isnan(values), -1, bins)
+
+
+def _export_bin(value):
+    return int(_export_bins([value])[0])
+
+
+# =====================================================
+# FLEET TABLE
+# =====================================================
+class FleetTable:
+    """Latest register values for every device as NumPy columns.
+
+    Aggregates (zero-export count, export-limit histogram, out-of-policy
+    count) are adjusted per update from the row's old and new values, so
+    reading them is O(1) regardless of fleet size. Only staleness depends
+    on the clock and is computed with one vectorised comparison.
+    """
+
+    def __init__(self, devices=(), policy=None, capacity=1024):
+        self.devices = []
+        self.index = {}
+        self.policy = dict(policy or DEFAULT_POLICY)
+
+        capacity = max(capacity, len(devices))
+        self.values = np.full((capacity, len(COLUMNS)), np.nan)
+        self.last_seen = np.full(capacity, np.nan)
+        self.last_cmd = np.full(capacity, np.nan)
+        self.latency = np.full(capacity, np.nan)
+        self.out_of_policy = np.zeros(capacity, dtype=bool)
+
+        self.zero_export_count = 0
+        self.out_of_policy_count = 0
+        self.export_hist = np.zeros(len(EXPORT_BIN_LABELS), dtype=np.int64)
+
+        self.version = 0
+        self._lock = threading.Lock()
+        self._frame = (None, None)
+
+        for device in devices:
+            self._row(device)
+
+    # -------------------------------------------------
+    # rows
+    # -------------------------------------------------
+    def _grow(self):
+        extra = len(self.last_seen)
+        self.values = np.vstack([self.values, np.full((extra, len(COLUMNS)), np.nan)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(extra, np.nan)])
+        self.last_cmd = np.concatenate([self.last_cmd, np.full(extra, np.nan)])
+        self.latency = np.concatenate([self.latency, np.full(extra, np.nan)])
+        self.out_of_policy = np.concatenate([self.out_of_policy, np.zeros(extra, dtype=bool)])
+
+    def _row(self, device):
+        i = self.index.get(device)
+        if i is None:
+            i = len(self.devices)
+            if i == len(self.last_seen):
+                self._grow()
+            self.devices.append(device)
+            self.index[device] = i
+        return i
+
+    def _row_out_of_policy(self, i):
+        for name, (lo, hi) in self.policy.items():
+            v = self.values[i, COL[name]]
+            if not np.isnan(v) and not lo <= v <= hi:
+                return True
+        return False
+
+    # -------------------------------------------------
+    # incremental updates
+    # -------------------------------------------------
+    def note_command(self, device, ts=None):
+        with self._lock:
+            self.last_cmd[self._row(device)] = time.time() if ts is None else ts
+
+    def update(self, device, registers, ts=None):
+        """Apply {register: value} from one response."""
+        columns = {REGISTER_COLUMNS[r]: v for r, v in registers.items() if r in REGISTER_COLUMNS}
+        if ts is None:
+            ts = time.time()
+
+        with self._lock:
+            i = self._row(device)
+
+            if not np.isnan(self.last_cmd[i]):
+                self.latency[i] = ts - self.last_cmd[i]
+                self.last_cmd[i] = np.nan
+            self.last_seen[i] = ts
+
+            if "export_limit" in columns:
+                old = self.values[i, COL["export_limit"]]
+                new = float(columns["export_limit"])
+
+                self.zero_export_count += int(new <= ZERO_EXPORT_MAX) - int(old <= ZERO_EXPORT_MAX)
+                old_bin, new_bin = _export_bin(old), _export_bin(new)
+                if old_bin >= 0:
+                    self.export_hist[old_bin] -= 1
+                self.export_hist[new_bin] += 1
+
+            for name, value in columns.items():
+                self.values[i, COL[name]] = value
+
+            was = self.out_of_policy[i]
+            now = self._row_out_of_policy(i)
+            self.out_of_policy[i] = now
+            self.out_of_policy_count += int(now) - int(was)
+
+            self.version += 1
+
+    def apply_rows(self, rows, values, last_seen, latency):
+        """Vectorised form of `update` for many rows at once (row order
+        must match the table's device order)."""
+        with self._lock:
+            exp = COL["export_limit"]
+            old, new = self.values[rows, exp], values[:, exp]
+
+            self.zero_export_count += int((new <= ZERO_EXPORT_MAX).sum()) - int((old <= ZERO_EXPORT_MAX).sum())
+            old_bins, new_bins = _export_bins(old), _export_bins(new)
+            np.subtract.at(self.export_hist, old_bins[old_bins >= 0], 1)
+            np.add.at(self.export_hist, new_bins[new_bins >= 0], 1)
+
+            self.values[rows] = values
+            self.last_seen[rows] = last_seen
+            self.latency[rows] = latency
+
+            mask = np.zeros(len(rows), dtype=bool)
+            for name, (lo, hi) in self.policy.items():
+                v = values[:, COL[name]]
+                mask |= ~np.isnan(v) & ((v < lo) | (v > hi))
+
+            self.out_of_policy_count += int(mask.sum()) - int(self.out_of_policy[rows].sum())
+            self.out_of_policy[rows] = mask
+            self.version += 1
+
+    def set_policy(self, policy):
+        with self._lock:
+            if dict(policy) == self.policy:
+                return
+            self.policy = dict(policy)
+
+            n = len(self.devices)
+            mask = np.zeros(n, dtype=bool)
+            for name, (lo, hi) in self.policy.items():
+                v = self.values[:n, COL[name]]
+                mask |= ~np.isnan(v) & ((v < lo) | (v > hi))
+
+            self.out_of_policy[:n] = mask
+            self.out_of_policy_count = int(mask.sum())
+            self.version += 1
+
+    # -------------------------------------------------
+    # reads
+    # -------------------------------------------------
+    def stale_mask(self, now=None):
+        if now is None:
+            now = time.time()
+        seen = self.last_seen[:len(self.devices)]
+        return np.isnan(seen) | (now - seen > STALE_AFTER)
+
+    def summary(self, now=None):
+        return {
+            "devices": len(self.devices),
+            "seen": int((~np.isnan(self.last_seen[:len(self.devices)])).sum()),
+            "zero_export": self.zero_export_count,
+            "out_of_policy": self.out_of_policy_count,
+            "stale": int(self.stale_mask(now).sum()),
+        }
+
+    def histogram(self):
+        return pd.Series(self.export_hist, index=EXPORT_BIN_LABELS, name="devices")
+
+    def frame(self):
+        """DataFrame of all rows, rebuilt only when the table changed."""
+        version, frame = self._frame
+        if version == self.version and frame is not None:
+            return frame
+
+        with self._lock:
+            n = len(self.devices)
+            frame = pd.DataFrame(self.values[:n], columns=COLUMNS, index=pd.Index(self.devices, name="device"))
+            frame["last_seen"] = pd.to_datetime(self.last_seen[:n], unit="s")
+            frame["latency_s"] = self.latency[:n]
+            frame["out_of_policy"] = self.out_of_policy[:n]
+            self._frame = (self.version, frame)
+
+        return frame
+
+
+# =====================================================
+# PASSIVE FLEET LISTENER
+# =====================================================
+class FleetListener:
+    """Wildcard subscription on every device's Command and Response topic,
+    one connection per configured broker.
+
+    Sees traffic from all pages, hubs and bulk jobs without sending
+    anything itself; commands start the latency clock, responses update
+    the table.
+    """
+
+    def __init__(self, table, brokers=BROKERS):
+        self.table = table
+        self.brokers = brokers
+        self._connected = set()
+        self._clients = []
+
+    @property
+    def connected(self):
+        return len(self._connected) == len(self.brokers)
+
+    def sync(self):
+        # updates are applied from the MQTT thread as they arrive
+        return 0
+
+    def start(self):
+        for b, broker in enumerate(self.brokers):
+            self._clients.append(self._start_broker(b, broker))
+
+    def _start_broker(self, b, broker):
+        import paho.mqtt.client as mqtt
+
+        client = mqtt.Client()
+        table = self.table
+
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                client.subscribe([("/AC/5/+/Command", 0), ("/AC/5/+/Response", 0)])
+                self._connected.add(b)
+
+        def on_disconnect(client, userdata, rc):
+            self._connected.discard(b)
+
+        def on_message(client, userdata, msg):
+            parts = msg.topic.split("/")
+            device, kind = device_label(broker, parts[3]), parts[4]
+
+            if kind == "Command":
+                if msg.payload.startswith(b"READ"):
+                    table.note_command(device)
+                return
+
+            registers = parse_registers(msg.payload.decode(errors="ignore"))
+            if registers:
+                table.update(device, registers)
+
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
+        client.connect_async(broker["host"], broker["port"], 60)
+        client.loop_start()
+        return client
+
+
+_fleet = None
+_fleet_lock = threading.Lock()
+
+
+def get_fleet():
+    """Process-wide (table, source) shared by all sessions.
+
+    With CT_INGEST_WORKERS > 0 the source is the sharded multi-process
+    ingestion tier, otherwise a single in-process listener.
+    """
+    global _fleet
+
+    with _fleet_lock:
+        if _fleet is None:
+            import ingestion
+
+            # rows follow DEVICE_TOPICS, the same labels every page uses
+            table = FleetTable(DEVICE_TOPICS, load_policy())
+            if ingestion.WORKERS > 0:
+                source = ingestion.ShardedIngestion(table, BROKERS)
+            else:
+                source = FleetListener(table, BROKERS)
+                source.start()
+            _fleet = (table, source)
+        return _fleet
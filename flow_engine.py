@@ -0,0 +1,246 @@
+import time
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from inverter_protocol import extract_register, is_up_processed, lock_command, unlock_command
+from register_catalog import REGISTERS, Register
+
+TIMEOUT = 6          # s per awaited response
+SETTLE = 0.8         # s after final UP PROCESSED before verify
+STEP_GAP = 0.5       # s between unlock → write → lock when unattended
+
+# =====================================================
+# STEPS / EVENTS
+# =====================================================
+READ = "READ"
+UNLOCK = "UNLOCK"
+WRITE = "WRITE"
+LOCK = "LOCK"
+WAIT_UP = "WAIT_UP"
+DELAY = "DELAY"
+VERIFY = "VERIFY"
+
+SENT = "sent"
+VALUE = "value"
+UP = "up"
+ELAPSED = "elapsed"
+TIMED_OUT = "timeout"
+
+# what a step waits for once its command (if any) is out
+AWAITS = {
+    READ: VALUE,
+    VERIFY: VALUE,
+    WAIT_UP: UP,
+    DELAY: ELAPSED,
+    UNLOCK: SENT,
+    WRITE: SENT,
+    LOCK: SENT,
+}
+
+# outcomes
+RUNNING = "RUNNING"
+DONE = "DONE"
+VERIFIED = "VERIFIED"
+MISMATCH = "MISMATCH"
+TIMEOUT_OUTCOME = "TIMEOUT"
+
+
+class Step(NamedTuple):
+    kind: str
+    register: Optional[Register] = None
+    seconds: float = 0.0
+
+
+class Flow:
+    """Immutable step list plus its (step index, event) → next index table."""
+
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = tuple(steps)
+
+        end = len(self.steps)
+        self.transitions = {}
+        for i, step in enumerate(self.steps):
+            self.transitions[(i, AWAITS[step.kind])] = i + 1
+            self.transitions[(i, TIMED_OUT)] = end
+
+
+# =====================================================
+# FLOW RUN
+# =====================================================
+class FlowRun:
+    """One execution of a Flow; no I/O, no session state.
+
+    Feed responses with `feed()`, then call `advance()` which returns the
+    (step, command) pairs to publish. Steps that only send a command, and
+    delays that have already elapsed, are chained within one call, so a
+    whole unlock → write → lock sequence leaves in a single tick.
+    """
+
+    def __init__(self, flow, value=None, password=None, timeout=TIMEOUT):
+        self.flow = flow
+        self.value = value
+        self.password = password
+        self.timeout = timeout
+
+        self.index = 0
+        self.issued_at = None
+        self.results = {}
+        self.outcome = RUNNING
+        self.reason = None
+        self.log = []
+
+        self._inbox = deque()
+
+    @property
+    def finished(self):
+        return self.outcome != RUNNING
+
+    @property
+    def step(self):
+        return self.flow.steps[self.index]
+
+    def feed(self, ts, payload):
+        self._inbox.append((ts, payload))
+
+    def drain_log(self):
+        log, self.log = self.log, []
+        return log
+
+    # -------------------------------------------------
+    # step handlers
+    # -------------------------------------------------
+    def _command(self, step):
+        if step.kind in (READ, VERIFY):
+            return step.register.read_command()
+        if step.kind == UNLOCK:
+            return unlock_command(self.password)
+        if step.kind == WRITE:
+            return step.register.write_command(self.value)
+        if step.kind == LOCK:
+            return lock_command()
+        return None
+
+    def _match(self, step, payload):
+        if step.kind == WAIT_UP:
+            return True if is_up_processed(payload) else None
+        return extract_register(payload, step.register.read)
+
+    def _on_event(self, event, result=None):
+        step = self.step
+
+        if event == VALUE:
+            self.results[step.register.name] = result
+            if step.kind == VERIFY:
+                if result == self.value:
+                    self.outcome = VERIFIED
+                    self.log.append(f"✔ Verification success: {step.register.read}={result}")
+                else:
+                    self.outcome = MISMATCH
+                    self.reason = f"Expected {self.value}, got {result}"
+                    self.log.append(f"✖ Verification failed: expected {self.value}, got {result}")
+            else:
+                self.log.append(f"FOUND {step.register.read}={result}")
+
+        elif event == UP:
+            self.log.append("🔐 Final UP PROCESSED received → settling before verify")
+
+        elif event == TIMED_OUT:
+            waiting_for = "UP PROCESSED" if step.kind == WAIT_UP else "register"
+            self.outcome = TIMEOUT_OUTCOME
+            self.reason = f"timeout waiting for {waiting_for}"
+            self.log.append(f"⏱ TIMEOUT waiting for {waiting_for}")
+
+        self.index = self.flow.transitions[(self.index, event)]
+        self.issued_at = None
+
+        if self.index == len(self.flow.steps) and self.outcome == RUNNING:
+            self.outcome = DONE
+
+    # -------------------------------------------------
+    # tick
+    # -------------------------------------------------
+    def advance(self, now=None):
+        if now is None:
+            now = time.time()
+        sent = []
+
+        while not self.finished:
+            step = self.step
+            awaits = AWAITS[step.kind]
+
+            if self.issued_at is None:
+                cmd = self._command(step)
+                self.issued_at = now
+                if cmd:
+                    sent.append((step, cmd))
+                if awaits == SENT:
+                    self._on_event(SENT)
+                    continue
+
+            if awaits == ELAPSED:
+                if now - self.issued_at >= step.seconds:
+                    self._on_event(ELAPSED)
+                    continue
+                break
+
+            result = None
+            while self._inbox:
+                ts, payload = self._inbox.popleft()
+                if ts < self.issued_at:
+                    continue    # answer to something sent before this step
+                result = self._match(step, payload)
+                if result is not None:
+                    break
+
+            if result is not None:
+                self._on_event(awaits, result)
+                continue
+
+            if now - self.issued_at > self.timeout:
+                self._on_event(TIMED_OUT)
+            break
+
+        return sent
+
+
+# =====================================================
+# FLOW LIBRARY (compiled once per process)
+# =====================================================
+@lru_cache(maxsize=None)
+def read_flow(*names):
+    return Flow(f"read:{'+'.join(names)}", [Step(READ, REGISTERS[n]) for n in names])
+
+
+@lru_cache(maxsize=None)
+def apply_flow(name):
+    """Operator already unlocked and wrote; lock, wait, settle, verify."""
+    reg = REGISTERS[name]
+    return Flow(f"apply:{name}", [
+        Step(LOCK),
+        Step(WAIT_UP),
+        Step(DELAY, seconds=SETTLE),
+        Step(VERIFY, reg),
+    ])
+
+
+@lru_cache(maxsize=None)
+def write_flow(name):
+    """Unattended unlock → write → lock → verify."""
+    reg = REGISTERS[name]
+    return Flow(f"write:{name}", [
+        Step(UNLOCK),
+        Step(DELAY, seconds=STEP_GAP),
+        Step(WRITE, reg),
+        Step(DELAY, seconds=STEP_GAP),
+        Step(LOCK),
+        Step(WAIT_UP),
+        Step(DELAY, seconds=SETTLE),
+        Step(VERIFY, reg),
+    ])
+
+
+@lru_cache(maxsize=None)
+def verify_flow(name):
+    return Flow(f"verify:{name}", [Step(VERIFY, REGISTERS[name])])
@@ -0,0 +1,219 @@
+import atexit
+import bisect
+import hashlib
+import multiprocessing as mp
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from fleet_table import COL, COLUMNS, REGISTER_COLUMNS
+from inverter_protocol import BROKERS, fleet_devices
+
+# =====================================================
+# CONFIG (brokers and prefixes live in inverter_protocol)
+# =====================================================
+WORKERS = int(os.environ.get("CT_INGEST_WORKERS", "0"))   # 0 → in-process listener
+CONNECTIONS_PER_WORKER = int(os.environ.get("CT_INGEST_CONNECTIONS", "2"))
+VNODES = 64
+SUBSCRIBE_BATCH = 200
+
+# shared row layout: register columns, then bookkeeping
+LAST_SEEN = len(COLUMNS)
+LAST_CMD = LAST_SEEN + 1
+LATENCY = LAST_SEEN + 2
+SEQ = LAST_SEEN + 3
+FIELDS = SEQ + 1
+
+
+# =====================================================
+# CONSISTENT HASHING
+# =====================================================
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, shards, vnodes=VNODES):
+        points = sorted(
+            (_hash(f"shard-{s}#{v}"), s) for s in range(shards) for v in range(vnodes)
+        )
+        self._keys = [k for k, _ in points]
+        self._shards = [s for _, s in points]
+
+    def shard_of(self, device):
+        i = bisect.bisect(self._keys, _hash(device)) % len(self._keys)
+        return self._shards[i]
+
+
+# =====================================================
+# WORKER PROCESS
+# =====================================================
+def _worker_main(worker, workers, connections, brokers, shm_name, connected):
+    import paho.mqtt.client as mqtt
+
+    from inverter_protocol import parse_registers
+
+    devices = fleet_devices(brokers)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    rows = np.ndarray((len(devices), FIELDS), dtype=np.float64, buffer=shm.buf)
+
+    ring = HashRing(workers * connections)
+    row_of = {(b, d): i for i, (b, d) in enumerate(devices)}
+
+    def write(i, registers, ts):
+        # seqlock: odd while the row is being written
+        rows[i, SEQ] += 1
+        for register, value in registers.items():
+            rows[i, COL[REGISTER_COLUMNS[register]]] = value
+        if not np.isnan(rows[i, LAST_CMD]):
+            rows[i, LATENCY] = ts - rows[i, LAST_CMD]
+            rows[i, LAST_CMD] = np.nan
+        rows[i, LAST_SEEN] = ts
+        rows[i, SEQ] += 1
+
+    def make_client(shard, b, assigned):
+        broker = brokers[b]
+        client = mqtt.Client()
+
+        def on_connect(client, userdata, flags, rc):
+            if rc != 0:
+                return
+            topics = [
+                (f"/AC/5/{d}/{kind}", 0) for d in assigned for kind in ("Command", "Response")
+            ]
+            for k in range(0, len(topics), SUBSCRIBE_BATCH):
+                client.subscribe(topics[k:k + SUBSCRIBE_BATCH])
+            connected[shard] = 1
+
+        def on_disconnect(client, userdata, rc):
+            connected[shard] = 0
+
+        def on_message(client, userdata, msg):
+            parts = msg.topic.split("/")
+            i = row_of.get((b, parts[3]))
+            if i is None:
+                return
+
+            if parts[4] == "Command":
+                if msg.payload.startswith(b"READ"):
+                    rows[i, LAST_CMD] = time.time()
+                return
+
+            registers = parse_registers(msg.payload.decode(errors="ignore"))
+            registers = {r: v for r, v in registers.items() if r in REGISTER_COLUMNS}
+            if registers:
+                write(i, registers, time.time())
+
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
+        client.connect_async(broker["host"], broker["port"], 60)
+        client.loop_start()
+        return client
+
+    clients = []
+    for c in range(connections):
+        shard = worker * connections + c
+        for b in range(len(brokers)):
+            assigned = [d for bb, d in devices if bb == b and ring.shard_of(d) == shard]
+            if assigned:
+                clients.append(make_client(shard, b, assigned))
+
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        for client in clients:
+            client.loop_stop()
+        shm.close()
+
+
+# =====================================================
+# INGESTION TIER (UI side)
+# =====================================================
+class ShardedIngestion:
+    """Worker processes own the MQTT connections; the UI process only reads.
+
+    Devices are spread over workers × connections shards with a consistent
+    hash ring, so adding a shard moves ~1/N of the fleet. Every device has a
+    fixed row in one shared-memory array. `sync()` copies only the rows
+    whose sequence number moved into a FleetTable via its vectorised
+    incremental update.
+    """
+
+    def __init__(self, table, brokers=None, workers=WORKERS, connections=CONNECTIONS_PER_WORKER):
+        self.table = table
+        self.brokers = brokers or BROKERS
+        self.workers = workers or os.cpu_count() or 1
+        self.connections = connections
+        self.devices = fleet_devices(self.brokers)
+
+        n = len(self.devices)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(n, 1) * FIELDS * 8)
+        self.rows = np.ndarray((n, FIELDS), dtype=np.float64, buffer=self._shm.buf)
+        self.rows[:] = np.nan
+        self.rows[:, SEQ] = 0
+        self._synced = np.zeros(n)
+        self._sync_lock = threading.Lock()
+
+        ctx = mp.get_context("spawn")
+        self._connected = ctx.Array("b", self.workers * self.connections, lock=False)
+        self._procs = [
+            ctx.Process(
+                target=_worker_main,
+                args=(w, self.workers, self.connections, self.brokers, self._shm.name, self._connected),
+                name=f"ingest-{w}",
+                daemon=True,
+            )
+            for w in range(self.workers)
+        ]
+        for p in self._procs:
+            p.start()
+
+        atexit.register(self.stop)
+
+    @property
+    def connected(self):
+        return any(self._connected)
+
+    def sync(self):
+        with self._sync_lock:
+            seq = self.rows[:, SEQ].copy()
+            changed = np.flatnonzero((seq != self._synced) & (seq % 2 == 0))
+            if not len(changed):
+                return 0
+
+            snapshot = self.rows[changed].copy()
+            # drop rows a worker touched while we copied; next sync gets them
+            stable = (
+                (snapshot[:, SEQ] == seq[changed])
+                & (snapshot[:, SEQ] == self.rows[changed, SEQ])
+                & (snapshot[:, SEQ] % 2 == 0)
+            )
+            changed, snapshot = changed[stable], snapshot[stable]
+
+            self.table.apply_rows(
+                changed,
+                snapshot[:, :len(COLUMNS)],
+                snapshot[:, LAST_SEEN],
+                snapshot[:, LATENCY],
+            )
+            self._synced[changed] = snapshot[:, SEQ]
+            return len(changed)
+
+    def stop(self):
+        for p in self._procs:
+            if p.is_alive():
+                p.terminate()
+        for p in self._procs:
+            p.join(timeout=2)
+        self._procs = []
+
+        if self._shm is not None:
+            self.rows = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
@@ -0,0 +1,142 @@
+import json
+import os
+import re
+
+# =====================================================
+# COMMAND FORMAT
+# =====================================================
+READ_AUTH = "**12345##1234567890"
+
+PASSWORD_REGISTER = "1536"
+LOCK_CODE = "00001"
+
+RSP_FALLBACK = re.compile(r'"rsp"\s*:\s*"([\s\S]*)"\s*}')
+
+# =====================================================
+# BROKERS / DEVICES (built once per process, shared by every page and tier)
+# =====================================================
+# CT_BROKERS may hold the same structure as JSON to add brokers/prefixes.
+BROKERS_ENV = "CT_BROKERS"
+DEFAULT_BROKERS = [
+    {"host": "ecozen.ai", "port": 1883, "prefixes": {"EZMCOGX": 300}},
+]
+
+
+def load_brokers():
+    raw = os.environ.get(BROKERS_ENV)
+    return json.loads(raw) if raw else DEFAULT_BROKERS
+
+
+def fleet_devices(brokers):
+    """[(broker index, device id)] in a fixed order."""
+    return [
+        (b, f"{prefix}{i:06d}")
+        for b, broker in enumerate(brokers)
+        for prefix, count in broker["prefixes"].items()
+        for i in range(1, count + 1)
+    ]
+
+
+def device_labels(brokers):
+    """Names used everywhere a device is picked or stored; host-qualified
+    when more than one broker could reuse a device id."""
+    devices = fleet_devices(brokers)
+    if len(brokers) == 1:
+        return [d for _, d in devices]
+    return [f"{brokers[b]['host']}/{d}" for b, d in devices]
+
+
+BROKERS = load_brokers()
+DEVICE_TOPICS = tuple(device_labels(BROKERS))
+_ADDRESS = dict(zip(DEVICE_TOPICS, fleet_devices(BROKERS)))
+
+
+def device_address(device):
+    """(broker, device id on that broker) for a label from DEVICE_TOPICS.
+
+    Unknown labels (e.g. journals from an older config) go to the first
+    broker under their own name.
+    """
+    b, device_id = _ADDRESS.get(device, (0, device.rsplit("/", 1)[-1]))
+    return BROKERS[b], device_id
+
+
+def device_label(broker, device_id):
+    """Inverse of device_address for a message seen on `broker`."""
+    return device_id if len(BROKERS) == 1 else f"{broker['host']}/{device_id}"
+
+
+def read_command(register, function="READ03"):
+    return f"{function}{READ_AUTH},{register}"
+
+
+def write_command(register, raw_value):
+    return f"UP#,{register}:{int(raw_value):05d}"
+
+
+def unlock_command(password):
+    return f"UP#,{PASSWORD_REGISTER}:{str(password).zfill(5)}"
+
+
+def lock_command():
+    return f"UP#,{PASSWORD_REGISTER}:{LOCK_CODE}"
+
+
+UNLOCK_VALUE = re.compile(rf"(UP#,{PASSWORD_REGISTER}:)(\d+)")
+
+
+def mask_password(cmd):
+    """`cmd` with any unlock password replaced by *****; the lock code stays."""
+    return UNLOCK_VALUE.sub(
+        lambda m: m.group(0) if m.group(2) == LOCK_CODE else m.group(1) + "*" * len(m.group(2)),
+        cmd,
+    )
+
+
+# =====================================================
+# RESPONSE PARSING (no session state, safe in threads)
+# =====================================================
+def parse_rsp(payload):
+    try:
+        return json.loads(payload).get("rsp", "")
+    except Exception:
+        m = RSP_FALLBACK.search(payload)
+        return m.group(1) if m else None
+
+
+def extract_register(payload, register):
+    rsp = parse_rsp(payload)
+    if not rsp or "READ PROCESSING" in rsp:
+        return None
+
+    for line in rsp.splitlines():
+        if line.startswith(f"{register}:"):
+            return int(line.split(":")[1])
+
+    return None
+
+
+def is_up_processed(payload) -> bool:
+    try:
+        rsp = json.loads(payload).get("rsp", "")
+    except Exception:
+        return False
+    return "UP PROCESSED" in rsp
+
+
+REGISTER_LINE = re.compile(r"^(\d{4}):(-?\d+)\s*$", re.M)
+
+
+def parse_registers(payload):
+    """Every `RRRR:value` line in a response, as {register: int}."""
+    rsp = parse_rsp(payload)
+    if not rsp or "READ PROCESSING" in rsp:
+        return {}
+    return {reg: int(val) for reg, val in REGISTER_LINE.findall(rsp)}
+
+
+def read_register_of(cmd):
+    """Register addressed by a READ03/READ04 command, else None."""
+    if not cmd.startswith("READ"):
+        return None
+    return cmd.rsplit(",", 1)[-1]
@@ -0,0 +1,108 @@
+import time
+from functools import lru_cache
+
+import streamlit as st
+
+from inverter_protocol import parse_registers, parse_rsp
+
+PAGE_SIZE = 10
+SEPARATOR = "\n\n---\n\n"
+
+STATUSES = ["All", "Data", "Read processing", "UP processed", "Other"]
+
+
+# =====================================================
+# CLASSIFICATION (once per distinct payload)
+# =====================================================
+@lru_cache(maxsize=1024)
+def classify(payload):
+    rsp = parse_rsp(payload) or ""
+    registers = frozenset(parse_registers(payload))
+
+    if "READ PROCESSING" in rsp:
+        status = "Read processing"
+    elif "UP PROCESSED" in rsp:
+        status = "UP processed"
+    elif registers:
+        status = "Data"
+    else:
+        status = "Other"
+
+    return status, registers
+
+
+def _matches(payload, register, status):
+    entry_status, registers = classify(payload)
+    if status != "All" and entry_status != status:
+        return False
+    if register and register not in registers:
+        return False
+    return True
+
+
+def _render_chunk(entries, pretty):
+    parts = []
+    for seq, ts, payload in entries:
+        head = f"#{seq} [{time.strftime('%H:%M:%S', time.localtime(ts))}] {classify(payload)[0]}"
+        body = (parse_rsp(payload) or payload) if pretty else payload
+        parts.append(f"{head}\n{body}")
+    return SEPARATOR.join(parts)
+
+
+# =====================================================
+# VIEWER
+# =====================================================
+def render_response_log(key="raw_log"):
+    """Windowed view of `response_log`, newest first.
+
+    Nothing is rendered while the toggle is off. The filtered index and the
+    visible chunk are cached in session state, keyed by `response_seq`, so a
+    rerun with no new responses re-sends the same small chunk.
+    """
+    log = st.session_state.response_log
+    latest = st.session_state.response_seq
+
+    if not st.toggle(f"📡 Raw MQTT Responses ({len(log)})", key=f"{key}_open"):
+        return
+
+    col1, col2, col3 = st.columns(3)
+    register = col1.text_input("Register", key=f"{key}_register", placeholder="e.g. 0802").strip()
+    status = col2.selectbox("Status", STATUSES, key=f"{key}_status")
+    pretty = col3.checkbox("Pretty-print rsp", key=f"{key}_pretty")
+
+    cache = st.session_state.setdefault(f"{key}_cache", {})
+
+    # sequence number of log[i] is first + i (log is trimmed from the front)
+    first = latest - len(log) + 1
+
+    filter_key = (latest, register, status)
+    if cache.get("filter_key") != filter_key:
+        cache["filter_key"] = filter_key
+        cache["matches"] = [
+            i for i in range(len(log) - 1, -1, -1)
+            if _matches(log[i][1], register, status)
+        ]
+    matches = cache["matches"]
+
+    if not matches:
+        st.caption("No matching responses")
+        return
+
+    pages = (len(matches) + PAGE_SIZE - 1) // PAGE_SIZE
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+
+    page = st.number_input(
+        f"Page (of {pages})", min_value=1, max_value=pages, key=f"{key}_page"
+    ) if pages > 1 else 1
+
+    chunk_key = (filter_key, page, pretty)
+    if cache.get("chunk_key") != chunk_key:
+        window = matches[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        cache["chunk_key"] = chunk_key
+        cache["chunk"] = _render_chunk(
+            [(first + i, log[i][0], log[i][1]) for i in window], pretty
+        )
+
+    st.caption(f"{len(matches)} matching · latest #{latest}")
+    st.code(cache["chunk"], language=None)
@@ -0,0 +1,138 @@
+import streamlit as st
+import os
+import time
+import pandas as pd
+import warnings
+
+from fleet_report import ExcelReport, export_report, job_rows, sheets_sink_from_env
+from inverter_protocol import DEVICE_TOPICS
+from register_catalog import WRITABLE
+from write_jobs import create_job, get_job, list_journals
+
+warnings.filterwarnings("ignore")
+
+# =====================================================
+# PAGE CONFIG
+# =====================================================
+st.set_page_config("Bulk Write Jobs", layout="centered")
+
+st.title("📦 Bulk Write Jobs")
+
+AUTO_REFRESH_MS = 1000
+
+DEFAULTS = {"export_limit": 10000}
+
+# =====================================================
+# NEW JOB
+# =====================================================
+st.subheader("➕ New Job")
+
+setting = st.selectbox(
+    "Setting", list(WRITABLE), format_func=lambda n: f"{WRITABLE[n].label} ({WRITABLE[n].unit})"
+)
+reg = WRITABLE[setting]
+
+value = st.number_input(
+    "Target Value", min_value=reg.min, max_value=reg.max, value=DEFAULTS.get(setting, 230)
+)
+
+all_devices = st.checkbox("All devices")
+devices = DEVICE_TOPICS if all_devices else st.multiselect("Devices", DEVICE_TOPICS)
+
+pwd = st.text_input("Password", type="password", key="new_job_pwd")
+
+if st.button("Start Job", disabled=not devices):
+    padded = pwd.zfill(5)
+    if padded == "02014":
+        job = create_job(setting, int(value), devices)
+        job.start(padded)
+        st.session_state.selected_journal = job.path
+        st.success(f"Job {job.job_id} started for {len(devices)} devices")
+    else:
+        st.error("Invalid password")
+
+# =====================================================
+# JOBS
+# =====================================================
+st.divider()
+st.subheader("📒 Jobs")
+
+journals = list_journals()
+
+if not journals:
+    st.info("No jobs yet")
+    st.stop()
+
+selected = st.session_state.get("selected_journal")
+index = journals.index(selected) if selected in journals else 0
+
+path = st.selectbox("Journal", journals, index=index, format_func=os.path.basename)
+st.session_state.selected_journal = path
+
+job = get_job(path)
+
+if job.running:
+    from streamlit_autorefresh import st_autorefresh
+
+    st_autorefresh(interval=AUTO_REFRESH_MS, key="job_refresh")
+
+done = len(job.devices) - len(job.pending())
+st.write(f"**{job.setting}** → `{job.value}` on {len(job.devices)} devices")
+st.progress(done / len(job.devices) if job.devices else 1.0)
+st.json(job.summary())
+
+if job.last_error:
+    st.error(
+        f"⚠ Job stopped at {time.strftime('%H:%M:%S', time.localtime(job.last_error_at))} → {job.last_error}"
+    )
+
+rows = [
+    {
+        "device": d,
+        "step": job.status.get(d, "PENDING"),
+        "value": job.details.get(d, {}).get("value"),
+        "reason": job.details.get(d, {}).get("reason"),
+    }
+    for d in job.devices
+]
+st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+col1, col2 = st.columns(2)
+
+if col1.button("Build Excel Report", disabled=job.running):
+    excel = ExcelReport()
+    export_report(writes=job_rows(job), excel=excel)
+    st.session_state.job_report = (job.job_id, excel.save())
+
+report = st.session_state.get("job_report")
+if report and report[0] == job.job_id:
+    col1.download_button("Download Excel Report", report[1], file_name=f"{job.job_id}.xlsx")
+
+if col2.button("Push to Google Sheets", disabled=job.running):
+    sink = sheets_sink_from_env()
+    if sink is None:
+        col2.error("Google Sheets export is not configured")
+    else:
+        col2.success(f"Pushed {export_report(writes=job_rows(job), sheets_sink=sink)} rows")
+
+# -------------------------------
+# RESUME
+# -------------------------------
+if job.running:
+    st.warning("Running…")
+elif job.pending():
+    st.info(
+        f"{len(job.pending())} devices not verified. "
+        "Resuming re-verifies interrupted devices before rewriting them."
+    )
+    resume_pwd = st.text_input("Password", type="password", key="resume_pwd")
+
+    if st.button("Resume Job"):
+        padded = resume_pwd.zfill(5)
+        if padded == "02014":
+            job.start(padded)
+            st.rerun()
+        else:
+            st.error("Invalid password")
+else:
+    st.success("✅ All devices verified")
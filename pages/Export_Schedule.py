@@ -0,0 +1,152 @@
+import streamlit as st
+import copy
+from datetime import datetime, time as dtime
+import pandas as pd
+import warnings
+
+from export_scheduler import (
+    MAX_CONCURRENT_WRITES,
+    PASSWORD_ENV,
+    SPREAD,
+    get_scheduler,
+    run_key,
+    target_value,
+)
+from inverter_protocol import DEVICE_TOPICS
+
+warnings.filterwarnings("ignore")
+
+# =====================================================
+# PAGE CONFIG
+# =====================================================
+st.set_page_config("Zero Export Schedule", layout="centered")
+
+st.title("🕘 Zero Export Schedule")
+
+scheduler = get_scheduler()
+config = copy.deepcopy(scheduler.config)
+
+st.caption(
+    f"Checks every policy each tick · at most {MAX_CONCURRENT_WRITES} devices written at once · "
+    f"starts spread over {SPREAD} s · last tick "
+    + (scheduler.last_tick.strftime("%H:%M:%S") if scheduler.last_tick else "—")
+)
+
+if not scheduler.enabled:
+    st.warning(f"⏸ Scheduler disabled → set {PASSWORD_ENV} to let policies write to inverters")
+
+if scheduler.last_error:
+    st.error(f"⚠ Last scheduler error at {scheduler.last_error_at:%H:%M:%S} → {scheduler.last_error}")
+
+# =====================================================
+# POLICIES
+# =====================================================
+st.subheader("📋 Policies")
+
+now = datetime.now()
+
+if config["policies"]:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "name": p["name"],
+                "target": p.get("group") or f"{len(p.get('devices', []))} devices",
+                "windows": ", ".join(f"{w['start']}–{w['end']} → {w['value']} W" for w in p["windows"]),
+                "default (W)": p["default"],
+                "now (W)": target_value(p, now),
+                "run": run_key(p, now),
+                "enabled": p.get("enabled", True),
+            }
+            for p in config["policies"]
+        ]),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    names = [p["name"] for p in config["policies"]]
+    selected = st.selectbox("Policy", names)
+    col1, col2 = st.columns(2)
+
+    if col1.button("Enable / Disable"):
+        for p in config["policies"]:
+            if p["name"] == selected:
+                p["enabled"] = not p.get("enabled", True)
+        scheduler.set_config(config)
+        st.rerun()
+
+    if col2.button("Delete"):
+        config["policies"] = [p for p in config["policies"] if p["name"] != selected]
+        scheduler.set_config(config)
+        st.rerun()
+else:
+    st.info("No policies yet")
+
+# -------------------------------
+# NEW POLICY
+# -------------------------------
+with st.expander("➕ New Policy"):
+    name = st.text_input("Name")
+
+    groups = list(config["groups"])
+    target = st.radio("Apply to", ["Group", "Devices"], horizontal=True, disabled=not groups)
+
+    if target == "Group" and groups:
+        group = st.selectbox("Group", groups)
+        devices = None
+    else:
+        group = None
+        devices = st.multiselect("Devices", DEVICE_TOPICS)
+
+    col1, col2, col3 = st.columns(3)
+    start = col1.time_input("From", dtime(9, 0), step=900)
+    end = col2.time_input("To", dtime(16, 0), step=900)
+    window_value = col3.number_input("Limit in window (W)", min_value=1, max_value=61000, value=1)
+    default = st.number_input("Limit otherwise (W)", min_value=1, max_value=61000, value=10000)
+
+    if st.button("Save Policy", disabled=not name or name in [p["name"] for p in config["policies"]]):
+        policy = {
+            "name": name,
+            "windows": [{
+                "start": start.strftime("%H:%M"),
+                "end": end.strftime("%H:%M"),
+                "value": int(window_value),
+            }],
+            "default": int(default),
+            "enabled": True,
+        }
+        if group:
+            policy["group"] = group
+        else:
+            policy["devices"] = devices
+
+        config["policies"].append(policy)
+        scheduler.set_config(config)
+        st.rerun()
+
+# -------------------------------
+# GROUPS
+# -------------------------------
+with st.expander("👥 Device Groups"):
+    for g, members in config["groups"].items():
+        st.write(f"**{g}** · {len(members)} devices")
+
+    group_name = st.text_input("Group name")
+    members = st.multiselect("Members", DEVICE_TOPICS, key="group_members")
+
+    if st.button("Save Group", disabled=not group_name or not members):
+        config["groups"][group_name] = members
+        scheduler.set_config(config)
+        st.rerun()
+
+# =====================================================
+# RUNS
+# =====================================================
+st.divider()
+st.subheader("📈 Recent Runs")
+
+if scheduler.runs:
+    runs = pd.DataFrame(list(scheduler.runs)[::-1])
+    runs["started_at"] = pd.to_datetime(runs["started_at"], unit="s")
+    st.dataframe(runs, use_container_width=True, hide_index=True)
+else:
+    st.info("No completed runs yet")
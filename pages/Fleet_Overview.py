@@ -0,0 +1,107 @@
+import streamlit as st
+import time
+import pandas as pd
+from streamlit_autorefresh import st_autorefresh
+import warnings
+
+from fleet_report import SHEETS_KEY_ENV, ExcelReport, export_report, fleet_rows, sheets_sink_from_env
+from fleet_table import STALE_AFTER, ZERO_EXPORT_MAX, get_fleet, save_policy
+
+warnings.filterwarnings("ignore")
+
+# =====================================================
+# PAGE CONFIG
+# =====================================================
+st.set_page_config("Fleet Overview", layout="wide")
+
+st.title("🛰️ Fleet Overview")
+
+AUTO_REFRESH_MS = 2000
+
+st_autorefresh(interval=AUTO_REFRESH_MS, key="fleet_refresh")
+
+table, source = get_fleet()
+source.sync()
+
+if source.connected:
+    st.caption("Listening to all device traffic")
+else:
+    st.warning("Connecting…")
+
+# =====================================================
+# POLICY
+# =====================================================
+# shared by every viewer and by the exports; only changed on Save
+with st.expander("⚖️ Voltage Policy"):
+    col1, col2 = st.columns(2)
+    high = col1.slider("Upper threshold allowed (V)", 150, 300, tuple(table.policy["voltage_high"]))
+    low = col2.slider("Lower threshold allowed (V)", 150, 300, tuple(table.policy["voltage_low"]))
+
+    policy = {"voltage_high": high, "voltage_low": low}
+    if st.button("Save Policy", disabled=policy == table.policy):
+        save_policy(policy)
+        table.set_policy(policy)
+        st.rerun()
+
+# =====================================================
+# AGGREGATES
+# =====================================================
+now = time.time()
+summary = table.summary(now)
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Devices seen", f"{summary['seen']} / {summary['devices']}")
+c2.metric(f"Zero export (≤ {ZERO_EXPORT_MAX} W)", summary["zero_export"])
+c3.metric("Voltage out of policy", summary["out_of_policy"])
+c4.metric(f"Stale (> {STALE_AFTER // 60} min)", summary["stale"])
+
+st.subheader("Export Limit Distribution")
+st.bar_chart(table.histogram())
+
+# =====================================================
+# DEVICES
+# =====================================================
+st.subheader("Devices")
+
+view = st.radio(
+    "Show",
+    ["All", "Zero export", "Out of policy", "Stale"],
+    horizontal=True,
+)
+
+frame = table.frame()
+
+if view == "Zero export":
+    frame = frame[frame["export_limit"] <= ZERO_EXPORT_MAX]
+elif view == "Out of policy":
+    frame = frame[frame["out_of_policy"]]
+elif view == "Stale":
+    # from the frame itself: rows may have been added since it was built
+    cutoff = pd.Timestamp(now - STALE_AFTER, unit="s")
+    frame = frame[frame["last_seen"].isna() | (frame["last_seen"] < cutoff)]
+
+st.dataframe(frame, use_container_width=True)
+
+# =====================================================
+# EXPORT
+# =====================================================
+st.subheader("📤 Export")
+
+col1, col2 = st.columns(2)
+
+if col1.button("Build Excel Report"):
+    excel = ExcelReport()
+    export_report(readings=fleet_rows(table), excel=excel)
+    st.session_state.fleet_report = (time.strftime("fleet-%Y%m%d-%H%M%S.xlsx"), excel.save())
+
+if st.session_state.get("fleet_report"):
+    name, data = st.session_state.fleet_report
+    col1.download_button("Download " + name, data, file_name=name)
+
+if col2.button("Push to Google Sheets"):
+    sink = sheets_sink_from_env()
+    if sink is None:
+        col2.error(f"Set {SHEETS_KEY_ENV} and the credentials path to enable")
+    else:
+        rows = export_report(readings=fleet_rows(table), sheets_sink=sink)
+        col2.success(f"Pushed {rows} rows")
@@ -1,12 +1,13 @@
 import streamlit as st
 import time
-import queue
-import json
-import re
-import paho.mqtt.client as mqtt
-from streamlit_autorefresh import st_autorefresh
 import warnings
 
+from device_session import connected_device, init_state, mqtt_connect, publish, start_flow, tick
+from flow_engine import MISMATCH, VERIFIED, apply_flow, read_flow
+from inverter_protocol import DEVICE_TOPICS, unlock_command
+from log_viewer import render_response_log
+from register_catalog import REGISTERS
+
 warnings.filterwarnings("ignore")
 
 # =====================================================
@@ -17,280 +18,55 @@ st.set_page_config("Grid Voltage Threshold Control", layout="centered")
 st.title("⚡ Grid Voltage Threshold Control")
 
 # =====================================================
-# MQTT CONFIG
+# 🔁 REGISTERS
 # =====================================================
-MQTT_BROKER = "ecozen.ai"
-MQTT_PORT = 1883
-
-AUTO_REFRESH_MS = 500
-MAX_LOG_LINES = 100
-TIMEOUT = 6
+VOLTAGE_HIGH = REGISTERS["voltage_high"]
+VOLTAGE_LOW = REGISTERS["voltage_low"]
 
-TOPIC_PREFIX = "EZMCOGX"
-DEVICE_TOPICS = [f"{TOPIC_PREFIX}{i:06d}" for i in range(1, 301)]
-
-# =====================================================
-# 🔁 REGISTER PLACEHOLDERS 
-# =====================================================
-REG_VOLTAGE_HIGH = "0808"  
-REG_VOLTAGE_LOW  = "0811"  
+MODE_REGISTER = {"Upper": VOLTAGE_HIGH, "Lower": VOLTAGE_LOW}
 
 # =====================================================
 # SESSION STATE INIT
 # =====================================================
-def init_state():
-    defaults = {
-        "mqtt_client": None,
-        "rx_queue": queue.Queue(),
-
-        "state": "IDLE",
-        "command_topic": None,
-
-        "voltage_high": None,
-        "voltage_low": None,
-
-        "pending_register": None,
-        "pending_since": None,
-        "parsed_payloads": set(),
-
-        "response_log": [],
-        "parse_debug": [],
-
-        "write_mode": None,          # "HIGH" | "LOW"
-        "write_password": "",
-        "write_unlocked": False,
-        "write_value": None,
-        "lock_sent_at": None,
-
-        "response_cursor": 0
-    }
-
-    for k, v in defaults.items():
-        if k not in st.session_state:
-            st.session_state[k] = v
-
-init_state()
-
-# =====================================================
-# MQTT SETUP
-# =====================================================
-def mqtt_connect(device_id):
-    if st.session_state.mqtt_client:
-        return
-
-    cmd = f"/AC/5/{device_id}/Command"
-    rsp = f"/AC/5/{device_id}/Response"
-
-    rx_queue = st.session_state.rx_queue
-    client = mqtt.Client()
-
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            client.subscribe(rsp)
-            rx_queue.put(("CONNECTED", None))
-
-    def on_message(client, userdata, msg):
-        rx_queue.put(("MSG", msg.payload.decode(errors="ignore")))
-
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
-
-    st.session_state.mqtt_client = client
-    st.session_state.command_topic = cmd
-    st.session_state.state = "CONNECTING"
-
-def publish(cmd):
-    ts = time.time()
-    st.session_state.parse_debug.append(f"📤 [{ts:.3f}] SENT → {cmd}")
-    st.session_state.mqtt_client.publish(
-        st.session_state.command_topic,
-        cmd,
-        qos=1
-    )
-
-# =====================================================
-# RX QUEUE
-# =====================================================
-def drain_rx_queue():
-    while not st.session_state.rx_queue.empty():
-        event, payload = st.session_state.rx_queue.get()
-
-        if event == "CONNECTED":
-            st.session_state.state = "CONNECTED"
-
-        elif event == "MSG":
-            st.session_state.response_log.append((time.time(), payload))
-            st.session_state.response_log = st.session_state.response_log[-MAX_LOG_LINES:]
-
-# =====================================================
-# PARSING
-# =====================================================
-def extract_register(payload, register):
-    dbg = st.session_state.parse_debug
-    dbg.append(payload)
-
-    try:
-        rsp = json.loads(payload).get("rsp", "")
-    except Exception:
-        m = re.search(r'"rsp"\s*:\s*"([\s\S]*)"\s*}', payload)
-        if not m:
-            return None
-        rsp = m.group(1)
-
-    if "READ PROCESSING" in rsp:
-        return None
-
-    for line in rsp.splitlines():
-        if line.startswith(f"{register}:"):
-            return int(line.split(":")[1])
-
-    return None
-
-def is_up_processed(payload):
-    try:
-        rsp = json.loads(payload).get("rsp", "")
-        return "UP PROCESSED" in rsp
-    except Exception:
-        return False
+init_state(voltage_high=None, voltage_low=None)
 
 # =====================================================
-# EVENT-DRIVEN PARSER  (VOLTAGE VERSION)
+# FLOW OUTCOMES
 # =====================================================
-def run_state_machine():
-    if (
-        not st.session_state.pending_register
-        and st.session_state.state not in (
-            "WAIT_UP_PROCESSED",
-            "VERIFY_VOLTAGE_DELAY",
-        )
-    ):
-        return
-
-    # ⏱ timeout guard (UNCHANGED)
-    if time.time() - st.session_state.pending_since > TIMEOUT:
-        if st.session_state.state == "WAIT_UP_PROCESSED":
-            st.session_state.parse_debug.append("⏱ TIMEOUT waiting for UP PROCESSED")
-        else:
-            st.session_state.parse_debug.append("⏱ TIMEOUT waiting for register")
-
-        st.session_state.pending_register = None
-        st.session_state.state = "CONNECTED"
-        st.session_state.parsed_payloads.clear()
-        return
-
-    # ---------------- VERIFY DELAY ----------------
-    if st.session_state.state == "VERIFY_VOLTAGE_DELAY":
-        if time.time() < st.session_state.verify_at:
-            return
-
-        publish(
-            f"READ03**12345##1234567890,{st.session_state.pending_register}"
-        )
-        st.session_state.state = "VERIFY_VOLTAGE_ONCE"
-        st.session_state.pending_since = time.time()
-        st.session_state.parsed_payloads.clear()
-        return
-
-    for ts, payload in st.session_state.response_log[st.session_state.response_cursor:]:
-        st.session_state.response_cursor += 1
-
-        if payload in st.session_state.parsed_payloads:
-            continue
-
-        st.session_state.parsed_payloads.add(payload)
-
-        # =====================================================
-        # WAIT FOR *FINAL* UP PROCESSED (after LOCK)
-        # =====================================================
-        if st.session_state.state == "WAIT_UP_PROCESSED":
-
-            if ts < st.session_state.lock_sent_at:
-                continue
-
-            if is_up_processed(payload):
-                st.session_state.parse_debug.append(
-                    "🔐 Final UP PROCESSED received → settling before verify"
-                )
-
-                if st.session_state.write_mode == "Upper":
-                    st.session_state.pending_register = "0808"
-                else:
-                    st.session_state.pending_register = "0811"
-                
-                st.session_state.verify_at = time.time() + 0.8
-                st.session_state.state = "VERIFY_VOLTAGE_DELAY"
-                st.session_state.parsed_payloads.clear()
-                break
-
+def on_flow_done(run):
+    # ---------------- VERIFY ----------------
+    for reg in MODE_REGISTER.values():
+        if run.flow is not apply_flow(reg.name):
             continue
 
-        # =====================================================
-        # REGISTER-BASED STATES
-        # =====================================================
-        value = extract_register(payload, st.session_state.pending_register)
-        if value is None:
-            continue
+        if run.outcome == VERIFIED:
+            st.session_state[reg.name] = run.value
+            st.success(f"✅ Voltage threshold set to {run.value} V")
+        elif run.outcome == MISMATCH:
+            st.error(f"❌ Verification failed. {run.reason}")
 
-        # ---------------- READ FLOW ----------------
-        if st.session_state.state == "READ_HIGH":
-            st.session_state.voltage_high = value
-
-            publish("READ03**12345##1234567890,0811")
-            st.session_state.pending_register = "0811"
-            st.session_state.pending_since = time.time()
-            st.session_state.state = "READ_LOW"
-            st.session_state.parsed_payloads.clear()
-            break
-
-        elif st.session_state.state == "READ_LOW":
-            st.session_state.voltage_low = value
-
-            st.session_state.pending_register = None
-            st.session_state.state = "CONNECTED"
-            st.session_state.parsed_payloads.clear()
-            break
-
-        # ---------------- VERIFY ----------------
-        elif st.session_state.state == "VERIFY_VOLTAGE_ONCE":
-
-            if value == st.session_state.write_value:
-                if st.session_state.write_mode == "Upper":
-                    st.session_state.voltage_high = value
-                else:
-                    st.session_state.voltage_low = value
-
-                st.success(f"✅ Voltage threshold set to {value} V")
-                st.session_state.parse_debug.append(
-                    f"✔ Verification success: {st.session_state.pending_register}={value}"
-                )
-            else:
-                st.error(
-                    f"❌ Verification failed. Expected {st.session_state.write_value}, got {value}"
-                )
-
-            st.session_state.state = "CONNECTED"
-            st.session_state.pending_register = None
+        if run.outcome in (VERIFIED, MISMATCH):
             st.session_state.write_unlocked = False
             st.session_state.write_value = None
-            st.session_state.parsed_payloads.clear()
-            break
+        return
+
+    # ---------------- READ FLOW ----------------
+    for reg in (VOLTAGE_HIGH, VOLTAGE_LOW):
+        if reg.name in run.results:
+            st.session_state[reg.name] = run.results[reg.name]
 
 # =====================================================
 # LOOP
 # =====================================================
-if st.session_state.mqtt_client:
-    st_autorefresh(interval=AUTO_REFRESH_MS, key="mqtt_refresh")
-    drain_rx_queue()
-    run_state_machine()
+tick(on_flow_done)
 
 # =====================================================
 # UI
 # =====================================================
 device = st.selectbox("Select Device", DEVICE_TOPICS)
 
-if st.button("Connect", disabled=st.session_state.state != "IDLE"):
+# switching device releases the previous hub
+if st.button("Connect", disabled=connected_device() == device):
     mqtt_connect(device)
 
 # st.success("Connected") if st.session_state.state == "CONNECTED" else st.warning("Connecting...")
@@ -302,12 +78,7 @@ else:
 # =====================================================
 # DEBUG
 # =====================================================
-with st.expander("📡 Raw MQTT Responses"):
-    st.text_area(
-        "Responses",
-        value="\n\n---\n\n".join(p for _, p in st.session_state.response_log),
-        height=300
-    )
+render_response_log()
 
 with st.expander("🧪 Parsing Debug Trace"):
     st.text_area(
@@ -320,15 +91,21 @@ with st.expander("🧪 Parsing Debug Trace"):
 # READ
 # =====================================================
 if st.button("Read Voltage Thresholds", disabled=st.session_state.state != "CONNECTED"):
-    publish(f"READ03**12345##1234567890,{REG_VOLTAGE_HIGH}")
-    st.session_state.pending_register = REG_VOLTAGE_HIGH
-    st.session_state.pending_since = time.time()
-    st.session_state.state = "READ_HIGH"
-    st.session_state.response_cursor = len(st.session_state.response_log)
+    start_flow(read_flow(VOLTAGE_HIGH.name, VOLTAGE_LOW.name), on_flow_done)
 
 st.text_input("Upper Voltage Threshold", st.session_state.voltage_high, disabled=True)
 st.text_input("Lower Voltage Threshold", st.session_state.voltage_low, disabled=True)
 
+# 👥 latest values seen by any session on this device
+hub = st.session_state.mqtt_client
+if hub:
+    shared = [
+        f"{reg}={hub.latest[reg][0]} @ {time.strftime('%H:%M:%S', time.localtime(hub.latest[reg][1]))}"
+        for reg in (VOLTAGE_HIGH.read, VOLTAGE_LOW.read)
+        if reg in hub.latest
+    ]
+    st.caption(f"👥 {hub.viewers} viewer(s) · " + (" · ".join(shared) or "no shared reads yet"))
+
 # =====================================================
 # WRITE
 # =====================================================
@@ -336,7 +113,7 @@ st.divider()
 st.subheader("⚙️ Set Voltage Threshold")
 
 mode = st.radio("Select Register", ["Upper", "Lower"])
-value = st.number_input("Voltage Value", min_value=150, max_value=300)
+value = st.number_input("Voltage Value", min_value=VOLTAGE_HIGH.min, max_value=VOLTAGE_HIGH.max)
 
 if st.button("Set"):
     st.session_state.write_mode = mode
@@ -355,7 +132,7 @@ if st.session_state.state == "WRITE_PASSWORD":
         padded = pwd.zfill(5)
         st.session_state.write_password = padded
 
-        publish(f"UP#,1536:{padded}")
+        publish(unlock_command(padded))
 
         if padded == "02014":
             st.session_state.write_unlocked = True
@@ -370,24 +147,21 @@ if st.session_state.state == "WRITE_PASSWORD":
 if st.session_state.state == "WRITE_VALUE" and st.session_state.write_unlocked:
     st.subheader("⚙️ Set Voltage Threshold")
 
+    reg = MODE_REGISTER[st.session_state.write_mode]
+
     value = st.number_input(
         "Voltage (V)",
-        min_value=150,
-        max_value=300,
+        min_value=reg.min,
+        max_value=reg.max,
         value=st.session_state.write_value or 230
     )
 
     if st.button("Set Value"):
-        scaled = value * 10
-        padded_val = f"{scaled:05d}"
         st.session_state.write_value = value
 
-        if st.session_state.write_mode == "Upper":
-            publish(f"UP#,1566:{padded_val}")
-        else:
-            publish(f"UP#,1567:{padded_val}")
-        
-        st.session_state.pending_register = None
+        # catalog applies the ×10 write scaling
+        publish(reg.write_command(value))
+
         st.session_state.state = "WRITE_LOCK"
 
 # -------------------------------
@@ -397,12 +171,5 @@ if st.session_state.state == "WRITE_LOCK":
     st.subheader("🔒 Lock Settings")
 
     if st.button("Lock & Apply"):
-        lock_ts = time.time()
-        publish("UP#,1536:00001")
-
-        st.session_state.lock_sent_at = lock_ts
-        st.session_state.state = "WAIT_UP_PROCESSED"
-        st.session_state.pending_since = lock_ts
-
-        st.session_state.parsed_payloads.clear()
-        st.session_state.response_cursor = len(st.session_state.response_log)
+        reg = MODE_REGISTER[st.session_state.write_mode]
+        start_flow(apply_flow(reg.name), on_flow_done, value=st.session_state.write_value)
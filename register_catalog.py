@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from inverter_protocol import read_command, write_command
+
+
+# =====================================================
+# REGISTER CATALOG
+# =====================================================
+@dataclass(frozen=True)
+class Register:
+    name: str
+    label: str
+    read: str                     # address read back (and seen in responses)
+    function: str = "READ03"      # READ03 holding / READ04 input
+    write: Optional[str] = None   # address written with UP#, None = read-only
+    write_scale: int = 1          # raw written = value * write_scale
+    min: Optional[int] = None
+    max: Optional[int] = None
+    unit: str = ""
+
+    def read_command(self):
+        return read_command(self.read, self.function)
+
+    def raw(self, value):
+        if self.write is None:
+            raise ValueError(f"{self.name} is read-only")
+        if self.min is not None and not self.min <= value <= self.max:
+            raise ValueError(f"{self.name}={value} outside {self.min}–{self.max} {self.unit}")
+        return int(value) * self.write_scale
+
+    def write_command(self, value):
+        return write_command(self.write, self.raw(value))
+
+
+REGISTERS = {
+    r.name: r
+    for r in (
+        Register("ct_power", "CT Power", read="1032", function="READ04", unit="W"),
+        Register("export_limit", "Export Limit", read="0802", write="1540", min=1, max=61000, unit="W"),
+        Register("voltage_high", "Upper Voltage Threshold", read="0808", write="1566", write_scale=10, min=150, max=300, unit="V"),
+        Register("voltage_low", "Lower Voltage Threshold", read="0811", write="1567", write_scale=10, min=150, max=300, unit="V"),
+    )
+}
+
+# read address as it appears in responses → register
+BY_ADDRESS = {r.read: r for r in REGISTERS.values()}
+
+WRITABLE = {name: r for name, r in REGISTERS.items() if r.write}
@@ -0,0 +1,136 @@
+"""Measure cold start: module import cost and first render per page.
+
+Every page is rendered in a fresh interpreter so nothing is shared with the
+previous one, then rendered again in the same process to show what a rerun
+(or switching back to the page) costs once imports and process-wide
+resources are warm. Usage:
+
+    python startup_profile.py pages   [page.py ...]
+    python startup_profile.py imports [--top N]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PAGES = [
+    "Ongrid_setting_app.py",
+    "pages/Voltage_Thresholds.py",
+    "pages/Bulk_Write_Jobs.py",
+    "pages/Export_Schedule.py",
+    "pages/Fleet_Overview.py",
+]
+
+APP_MODULES = [
+    "inverter_protocol", "register_catalog", "flow_engine", "traffic_recorder", "device_hub", "device_session",
+    "log_viewer", "write_jobs", "export_scheduler", "fleet_table", "fleet_report", "ingestion",
+]
+
+RENDER_TIMEOUT = 30
+
+
+# =====================================================
+# PAGES (one cold interpreter each)
+# =====================================================
+def _render(page):
+    """Runs inside the child interpreter; prints one JSON line."""
+    sys.path.insert(0, ROOT)
+
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+    t_streamlit = time.perf_counter() - t0
+
+    before = set(sys.modules)
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=RENDER_TIMEOUT)
+
+    t0 = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t0
+    loaded = len(set(sys.modules) - before)
+
+    t0 = time.perf_counter()
+    at.run()
+    rerun = time.perf_counter() - t0
+
+    print(json.dumps({
+        "page": page,
+        "streamlit_s": t_streamlit,
+        "first_render_s": first,
+        "rerun_s": rerun,
+        "modules_loaded": loaded,
+        "exceptions": [e.value for e in at.exception],
+    }))
+
+
+def profile_pages(pages=PAGES):
+    results = []
+    for page in pages:
+        out = subprocess.run(
+            [sys.executable, __file__, "_render", page],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+        if not lines:
+            results.append({"page": page, "error": out.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+# =====================================================
+# IMPORTS (python -X importtime)
+# =====================================================
+def profile_imports(modules=APP_MODULES, top=15):
+    """[(cumulative µs, module)] for the slowest imports of the app modules."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue    # header line
+        # top-level entries only (nested imports are indented)
+        if name.startswith(" ") and not name[1:2].isspace():
+            rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv):
+    if not argv or argv[0] not in ("pages", "imports", "_render"):
+        print(__doc__)
+        return 2
+
+    if argv[0] == "_render":
+        _render(argv[1])
+        return 0
+
+    if argv[0] == "imports":
+        top = int(argv[argv.index("--top") + 1]) if "--top" in argv else 15
+        for us, name in profile_imports(top=top):
+            print(f"{us / 1000:8.1f} ms  {name}")
+        return 0
+
+    for r in profile_pages(argv[1:] or PAGES):
+        if "error" in r:
+            print(f"{r['page']:<30} ✖ {r['error']}")
+            continue
+        print(
+            f"{r['page']:<30} streamlit {r['streamlit_s'] * 1000:6.0f} ms · "
+            f"first render {r['first_render_s'] * 1000:6.0f} ms · "
+            f"rerun {r['rerun_s'] * 1000:5.0f} ms · {r['modules_loaded']} modules"
+            + (f" · ⚠ {r['exceptions']}" if r["exceptions"] else "")
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,71 @@
+import gc
+import queue
+
+import pytest
+
+import device_hub
+from device_hub import DeviceHub, attach_hub, release_hub
+from inverter_protocol import lock_command, read_command, unlock_command, write_command
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+        self.stopped = False
+
+    def publish(self, topic, cmd, qos=0):
+        self.published.append(cmd)
+
+    def loop_stop(self):
+        self.stopped = True
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_mqtt(monkeypatch):
+    monkeypatch.setattr(device_hub, "_hubs", {})
+
+    def start(hub):
+        hub._client = FakeClient()
+
+    monkeypatch.setattr(DeviceHub, "_start", start)
+
+
+def test_last_viewer_leaving_closes_the_hub():
+    a, b = queue.Queue(), queue.Queue()
+    hub = attach_hub("D1", a)
+    assert attach_hub("D1", b) is hub
+    client = hub._client
+
+    release_hub(hub, a)
+    assert device_hub._hubs == {"D1": hub}
+    assert not client.stopped
+
+    release_hub(hub, b)
+    assert device_hub._hubs == {}
+    assert client.stopped
+
+
+def test_hubs_of_ended_sessions_are_reaped():
+    gone = queue.Queue()
+    hub = attach_hub("D1", gone)
+    client = hub._client
+    del gone
+    gc.collect()
+
+    attach_hub("D2", queue.Queue())
+
+    assert "D1" not in device_hub._hubs
+    assert client.stopped
+
+
+def test_read_after_write_is_not_merged():
+    viewer = queue.Queue()
+    hub = attach_hub("D1", viewer)
+    read = read_command("0802")
+
+    sent = [hub.publish(c) for c in (read, unlock_command("02014"), write_command("1540", 1), lock_command(), read, read)]
+
+    assert sent == [True, True, True, True, True, False]
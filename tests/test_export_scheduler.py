@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+import export_scheduler
+import write_jobs
+from export_scheduler import ExportScheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_jobs, "JOURNAL_DIR", str(tmp_path))
+    monkeypatch.setattr(export_scheduler, "PASSWORD", "02014")
+
+    started = []
+
+    def start(job, password, **kwargs):
+        job.running = True          # stays running until the test finishes it
+        started.append(job)
+
+    monkeypatch.setattr(write_jobs.BulkWriteJob, "start", start)
+
+    s = ExportScheduler.__new__(ExportScheduler)
+    s.config = {
+        "groups": {},
+        "policies": [{
+            "name": "tariff",
+            "devices": ["D1", "D2"],
+            "windows": [{"start": "09:00", "end": "16:00", "value": 1}],
+            "default": 10000,
+        }],
+    }
+    s.last_tick = None
+    s._lock = threading.Lock()
+    s._limiter = None
+    s._attempts = {}
+    s._active = {}
+    s._journal_of = {}
+    s.started = started
+    return s
+
+
+def test_superseded_run_is_stopped_before_the_next_starts(scheduler):
+    scheduler.tick(datetime(2026, 1, 1, 15, 59))
+    (old,) = scheduler.started
+    assert old.value == 1
+
+    # boundary passes while the 1 W run is still writing
+    scheduler.tick(datetime(2026, 1, 1, 16, 0))
+    assert old._stop.is_set()
+    assert scheduler.started == [old]
+
+    old.running = False
+    scheduler.tick(datetime(2026, 1, 1, 16, 1))
+    new = scheduler.started[-1]
+    assert new is not old
+    assert new.value == 10000
+
+
+def test_stop_leaves_unstarted_devices_pending(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_jobs, "JOURNAL_DIR", str(tmp_path))
+    job = write_jobs.BulkWriteJob.create("export_limit", 1, ["D1", "D2"])
+    job._connect = lambda: None
+    job._run_device = lambda device: pytest.fail("stopped job started a device")
+
+    job.stop("superseded")
+    job._run(max_workers=1, spread=0.0)
+
+    assert job.pending() == ["D1", "D2"]
+    assert job.last_error == "stopped: superseded"
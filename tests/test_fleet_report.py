@@ -0,0 +1,85 @@
+import io
+
+from openpyxl import load_workbook
+
+from fleet_report import (
+    READING_COLUMNS,
+    WRITE_COLUMNS,
+    BatchedSheetWriter,
+    ExcelReport,
+    GspreadSink,
+    InMemorySheets,
+    export_report,
+)
+
+
+def readings(n):
+    return ([f"EZMCOGX{i:06d}", i, 1, 230, 200, None, 0.5] for i in range(1, n + 1))
+
+
+def test_batches_rows_into_one_request_per_block():
+    sink = InMemorySheets()
+    count = export_report(readings=readings(1234), sheets_sink=sink, batch_rows=500)
+
+    assert count == 1234
+    assert sink.requests == 3       # header + 1234 rows → 500, 500, 235
+    rows = sink.sheets["Readings"]
+    assert rows[0] == READING_COLUMNS
+    assert len(rows) == 1235
+    assert rows[1][0] == "EZMCOGX000001"
+    assert rows[500][0] == "EZMCOGX000500"
+    assert rows[1234][0] == "EZMCOGX001234"
+    assert rows[1][5] == ""         # None → empty cell
+
+
+def test_writer_ranges_are_contiguous():
+    sink = InMemorySheets()
+    seen = []
+    sink.batch_update = lambda sheet, updates: seen.extend(a1 for a1, _ in updates)
+
+    writer = BatchedSheetWriter(sink, "Writes", WRITE_COLUMNS, batch_rows=4)
+    for i in range(6):
+        writer.append([i] * len(WRITE_COLUMNS))
+    writer.flush()
+
+    assert seen == ["A1:H4", "A5:H7"]
+
+
+def test_sections_not_passed_are_left_alone():
+    sink = InMemorySheets()
+    export_report(writes=[["job", "d", "export_limit", 1, "VERIFIED", 1, None, None]], sheets_sink=sink)
+    export_report(readings=readings(2), sheets_sink=sink)
+
+    assert len(sink.sheets["Writes"]) == 2
+    assert len(sink.sheets["Readings"]) == 3
+
+    excel = ExcelReport()
+    export_report(readings=readings(2), excel=excel)
+    assert load_workbook(io.BytesIO(excel.save())).sheetnames == ["Readings"]
+
+
+class FakeWorksheet:
+    def __init__(self, row_count):
+        self.row_count = row_count
+
+    def add_rows(self, n):
+        self.row_count += n
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.bodies = []
+
+    def values_batch_update(self, body):
+        self.bodies.append(body)
+
+
+def test_gspread_sink_grows_grid_before_update():
+    sink = GspreadSink.__new__(GspreadSink)
+    sink._spreadsheet = FakeSpreadsheet()
+    sink._worksheets = {"Readings": FakeWorksheet(row_count=100)}
+
+    sink.batch_update("Readings", [("A1:G120", [[0]] * 120)])
+
+    assert sink._worksheets["Readings"].row_count >= 120
+    assert sink._spreadsheet.bodies[0]["data"][0]["range"] == "'Readings'!A1:G120"
@@ -0,0 +1,109 @@
+import json
+
+from flow_engine import (
+    DONE,
+    MISMATCH,
+    SETTLE,
+    TIMEOUT,
+    TIMEOUT_OUTCOME,
+    VERIFIED,
+    FlowRun,
+    apply_flow,
+    read_flow,
+)
+from inverter_protocol import lock_command
+from register_catalog import REGISTERS
+
+CT = REGISTERS["ct_power"]
+EXPORT = REGISTERS["export_limit"]
+
+
+def rsp(text):
+    return json.dumps({"rsp": text})
+
+
+def commands(sent):
+    return [cmd for _, cmd in sent]
+
+
+def test_read_flow_chains_registers_on_a_clock_starting_at_zero():
+    run = FlowRun(read_flow(CT.name, EXPORT.name))
+
+    assert commands(run.advance(0.0)) == [CT.read_command()]
+    assert run.issued_at == 0.0
+
+    run.feed(0.5, rsp(f"{CT.read}:350"))
+    assert commands(run.advance(0.5)) == [EXPORT.read_command()]
+
+    run.feed(1.0, rsp(f"{EXPORT.read}:10000"))
+    assert run.advance(1.0) == []
+    assert run.outcome == DONE
+    assert run.results == {CT.name: 350, EXPORT.name: 10000}
+
+
+def test_responses_older_than_the_step_are_ignored():
+    run = FlowRun(read_flow(EXPORT.name))
+    run.advance(10.0)
+
+    run.feed(9.0, rsp(f"{EXPORT.read}:1"))
+    run.advance(10.5)
+    assert not run.finished
+
+    run.feed(11.0, rsp(f"{EXPORT.read}:2"))
+    run.advance(11.0)
+    assert run.results[EXPORT.name] == 2
+
+
+def test_timeout_without_answer():
+    run = FlowRun(read_flow(EXPORT.name))
+    run.advance(0.0)
+
+    run.advance(TIMEOUT)
+    assert not run.finished
+
+    run.advance(TIMEOUT + 0.1)
+    assert run.outcome == TIMEOUT_OUTCOME
+    assert run.reason == "timeout waiting for register"
+
+
+def test_apply_waits_for_up_then_settles_before_verify():
+    run = FlowRun(apply_flow(EXPORT.name), value=1)
+
+    assert commands(run.advance(0.0)) == [lock_command()]
+
+    # register data is not what WAIT_UP is waiting for
+    run.feed(0.1, rsp(f"{EXPORT.read}:1"))
+    assert run.advance(0.1) == []
+
+    run.feed(0.2, rsp("UP PROCESSED"))
+    assert run.advance(0.2) == []                 # settling
+
+    assert run.advance(0.2 + SETTLE / 2) == []
+    assert commands(run.advance(0.2 + SETTLE)) == [EXPORT.read_command()]
+
+    run.feed(1.5, rsp(f"{EXPORT.read}:1"))
+    run.advance(1.5)
+    assert run.outcome == VERIFIED
+
+
+def test_apply_reports_mismatch():
+    run = FlowRun(apply_flow(EXPORT.name), value=1)
+    run.advance(0.0)
+    run.feed(0.1, rsp("UP PROCESSED"))
+    run.advance(0.1)
+    run.advance(0.1 + SETTLE)
+
+    run.feed(2.0, rsp(f"{EXPORT.read}:10000"))
+    run.advance(2.0)
+
+    assert run.outcome == MISMATCH
+    assert run.reason == "Expected 1, got 10000"
+
+
+def test_apply_times_out_without_up_processed():
+    run = FlowRun(apply_flow(EXPORT.name), value=1)
+    run.advance(0.0)
+    run.advance(TIMEOUT + 1)
+
+    assert run.outcome == TIMEOUT_OUTCOME
+    assert run.reason == "timeout waiting for UP PROCESSED"
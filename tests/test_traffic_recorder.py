@@ -0,0 +1,75 @@
+import traffic_recorder
+from inverter_protocol import lock_command, read_command, unlock_command
+from traffic_recorder import RX, TX, read_records
+
+
+def test_unlock_password_is_masked(tmp_path, monkeypatch):
+    monkeypatch.setenv(traffic_recorder.RECORD_DIR_ENV, str(tmp_path))
+    monkeypatch.setattr(traffic_recorder, "_recorder", None)
+
+    traffic_recorder.record(TX, "/AC/5/D/Command", unlock_command("02014"))
+    traffic_recorder.record(TX, "/AC/5/D/Command", lock_command())
+    traffic_recorder.record(TX, "/AC/5/D/Command", read_command("0802"))
+    traffic_recorder.record(RX, "/AC/5/D/Response", b'{"rsp": "0802:1"}')
+    traffic_recorder.get_recorder().close()
+
+    (path,) = tmp_path.iterdir()
+    payloads = [payload for _, _, _, payload in read_records(str(path))]
+
+    assert payloads[0] == "UP#,1536:*****"
+    assert payloads[1] == lock_command()
+    assert payloads[2] == read_command("0802")
+    assert "02014" not in path.read_bytes().decode(errors="ignore")
+
+
+def zero_export_conversation(device="EZMCOGX000001", verified=1):
+    """What the Zero Export page sends and receives for read → write → verify."""
+    from inverter_protocol import write_command
+
+    cmd, rsp = f"/AC/5/{device}/Command", f"/AC/5/{device}/Response"
+    return [
+        (0.0, TX, cmd, read_command("1032", "READ04")),
+        (0.3, RX, rsp, '{"rsp": "1032:350"}'),
+        (1.0, TX, cmd, read_command("0802")),
+        (1.3, RX, rsp, '{"rsp": "0802:10000"}'),
+        (5.0, TX, cmd, unlock_command("02014")),
+        (5.2, RX, rsp, '{"rsp": "UP PROCESSED"}'),
+        (8.0, TX, cmd, write_command("1540", 1)),
+        (8.2, RX, rsp, '{"rsp": "UP PROCESSED"}'),
+        (12.0, TX, cmd, lock_command()),
+        (12.2, RX, rsp, '{"rsp": "UP PROCESSED"}'),
+        (13.1, TX, cmd, read_command("0802")),
+        (13.4, RX, rsp, f'{{"rsp": "0802:{verified}"}}'),
+    ]
+
+
+def replay_flows(records):
+    from traffic_recorder import FlowReplay
+
+    flows = FlowReplay()
+    results = []
+    for ts, direction, topic, payload in records:
+        if direction == TX:
+            flows.on_tx(ts, topic, payload)
+        else:
+            results.append(flows.on_rx(ts, topic, payload))
+    return flows, results
+
+
+def test_flow_replay_follows_recorded_commands():
+    flows, results = replay_flows(zero_export_conversation())
+
+    assert flows.outcomes == {
+        ("read:ct_power", "DONE"): 1,
+        ("read:export_limit", "DONE"): 1,
+        ("apply:export_limit", "VERIFIED"): 1,
+    }
+    assert results[0] == ("read:ct_power", "DONE", {"ct_power": 350})
+    assert results[-1][:2] == ("apply:export_limit", "VERIFIED")
+    assert not flows.runs
+
+
+def test_flow_replay_reports_mismatch():
+    flows, _ = replay_flows(zero_export_conversation(verified=10000))
+
+    assert flows.outcomes[("apply:export_limit", "MISMATCH")] == 1
@@ -0,0 +1,97 @@
+import pytest
+
+import write_jobs
+from flow_engine import VERIFIED as FLOW_VERIFIED
+from write_jobs import LOCK, UNLOCK, VERIFIED, WRITE, BulkWriteJob, WriteJournal
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_jobs, "JOURNAL_DIR", str(tmp_path))
+
+
+class Verified:
+    outcome = FLOW_VERIFIED
+
+
+def test_record_after_torn_tail_survives_reopen():
+    job = BulkWriteJob.create("export_limit", 1, ["D1"])
+    with open(job.path, "a", encoding="utf-8") as f:
+        f.write('{"ts":1,"step":"UNLOCK","dev')      # crash mid-write
+
+    job = BulkWriteJob(job.path)
+    job._log("D1", VERIFIED, value=1)
+
+    assert BulkWriteJob(job.path).status == {"D1": VERIFIED}
+
+
+def test_repair_keeps_complete_journal_untouched():
+    job = BulkWriteJob.create("export_limit", 1, ["D1"])
+    job._log("D1", UNLOCK)
+    with open(job.path, "rb") as f:
+        before = f.read()
+
+    WriteJournal(job.path).repair()
+
+    with open(job.path, "rb") as f:
+        assert f.read() == before
+
+
+@pytest.mark.parametrize(
+    "last_step, flows",
+    [
+        (UNLOCK, ["apply:export_limit"]),      # may still be unlocked → lock first
+        (WRITE, ["apply:export_limit"]),
+        (LOCK, ["verify:export_limit"]),
+        (VERIFIED, []),
+    ],
+)
+def test_resume_from_last_step(last_step, flows):
+    job = BulkWriteJob.create("export_limit", 1, ["D1"])
+    job._log("D1", last_step)
+
+    job = BulkWriteJob(job.path)
+    driven = []
+
+    def drive(device, run):
+        driven.append(run.flow.name)
+        return Verified()
+
+    job._drive = drive
+    job._run_device("D1")
+
+    assert driven == flows
+    assert job.status["D1"] == VERIFIED
+
+
+def test_job_level_failure_is_kept_on_the_job():
+    job = BulkWriteJob.create("export_limit", 1, ["D1"])
+
+    def unreachable():
+        raise ConnectionError("no CONNACK")
+
+    job._connect = unreachable
+    job._run(max_workers=1, spread=0.0)
+
+    assert job.last_error == "ConnectionError: no CONNACK"
+    assert BulkWriteJob(job.path).last_error == "ConnectionError: no CONNACK"
+
+
+def test_publish_goes_to_the_device_broker(monkeypatch):
+    brokers = {"a": {"host": "a", "port": 1883}, "b": {"host": "b", "port": 1883}}
+    monkeypatch.setattr(write_jobs, "device_address", lambda d: (brokers[d[0]], d.split("/")[1]))
+    sent = []
+
+    class FakeClient:
+        def __init__(self, host):
+            self.host = host
+
+        def publish(self, topic, cmd, qos=0):
+            sent.append((self.host, topic))
+
+    job = BulkWriteJob.create("export_limit", 1, ["a/D1", "b/D1"])
+    job._clients = {host: FakeClient(host) for host in brokers}
+    job._publish("a/D1", "READ")
+    job._publish("b/D1", "READ")
+
+    assert sent == [("a", "/AC/5/D1/Command"), ("b", "/AC/5/D1/Command")]
@@ -0,0 +1,300 @@
+"""Record MQTT traffic to a compact binary log and replay it offline.
+
+File layout: MAGIC, then one record per message:
+
+    <I record length> <d monotonic ts> <B direction> <H topic length> topic payload
+
+Recording is enabled by pointing CT_TRAFFIC_RECORD at a directory. Usage:
+
+    python traffic_recorder.py info  traffic-….bin
+    python traffic_recorder.py bench traffic-….bin [--realtime] [--flow]
+
+--flow re-runs the flow engine over the recorded conversations: recorded
+reads and lock commands start the matching flows per device, responses
+drive them, and the outcome counts are printed. Without it every response
+only goes through the bare parser.
+"""
+import mmap
+import os
+import statistics
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from flow_engine import FlowRun, apply_flow, read_flow
+from inverter_protocol import lock_command, mask_password, read_register_of
+from register_catalog import BY_ADDRESS, WRITABLE
+
+MAGIC = b"CTTRAF01"
+
+TX = 0   # command published by us
+RX = 1   # payload received from the device
+
+HEADER = struct.Struct("<dBH")
+LENGTH = struct.Struct("<I")
+
+RECORD_DIR_ENV = "CT_TRAFFIC_RECORD"
+
+
+# =====================================================
+# RECORDER
+# =====================================================
+class TrafficRecorder:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if new:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def append(self, direction, topic, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        topic = topic.encode()
+
+        header = HEADER.pack(time.monotonic(), direction, len(topic))
+        body = header + topic + payload
+
+        with self._lock:
+            self._file.write(LENGTH.pack(len(body)) + body)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Process-wide recorder, or None when CT_TRAFFIC_RECORD is unset."""
+    global _recorder
+
+    directory = os.environ.get(RECORD_DIR_ENV)
+    if not directory:
+        return None
+
+    with _recorder_lock:
+        if _recorder is None:
+            os.makedirs(directory, exist_ok=True)
+            name = time.strftime("traffic-%Y%m%d-%H%M%S") + f"-{os.getpid()}.bin"
+            _recorder = TrafficRecorder(os.path.join(directory, name))
+        return _recorder
+
+
+def record(direction, topic, payload):
+    recorder = get_recorder()
+    if recorder is not None:
+        if direction == TX:
+            # never persist the inverter password
+            if isinstance(payload, bytes):
+                payload = payload.decode(errors="ignore")
+            payload = mask_password(payload)
+        recorder.append(direction, topic, payload)
+
+
+# =====================================================
+# READER / REPLAY
+# =====================================================
+def read_records(path):
+    """Yield (ts, direction, topic, payload) from a memory-mapped log."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a traffic log")
+
+            offset = len(MAGIC)
+            end = len(mm)
+
+            while offset + LENGTH.size <= end:
+                (length,) = LENGTH.unpack_from(mm, offset)
+                start = offset + LENGTH.size
+                if start + length > end:
+                    break   # truncated tail from a crash
+
+                ts, direction, topic_len = HEADER.unpack_from(mm, start)
+                topic_at = start + HEADER.size
+                payload_at = topic_at + topic_len
+
+                yield (
+                    ts,
+                    direction,
+                    mm[topic_at:payload_at].decode(),
+                    mm[payload_at:start + length].decode(errors="ignore"),
+                )
+                offset = start + length
+
+
+def replay(path, on_tx=None, on_rx=None, speed=None):
+    """Feed a log into `on_tx/on_rx(ts, topic, payload)`; speed=None runs as
+    fast as possible, speed=1.0 keeps the recorded spacing."""
+    t0 = None
+    wall0 = time.monotonic()
+
+    for ts, direction, topic, payload in read_records(path):
+        if speed:
+            if t0 is None:
+                t0 = ts
+            delay = (ts - t0) / speed - (time.monotonic() - wall0)
+            if delay > 0:
+                time.sleep(delay)
+
+        handler = on_tx if direction == TX else on_rx
+        if handler is not None:
+            handler(ts, topic, payload)
+
+
+# =====================================================
+# BENCHMARK
+# =====================================================
+def benchmark(path, handler, speed=None, on_tx=None):
+    """Time `handler(ts, topic, payload)` per RX record.
+
+    `on_tx` (untimed) sees every recorded command first. Returns latency
+    stats and a CRC of the handler results, so two runs can be compared
+    for both speed and correctness.
+    """
+    latencies = []
+    crc = 0
+
+    def on_rx(ts, topic, payload):
+        nonlocal crc
+        t = time.perf_counter()
+        result = handler(ts, topic, payload)
+        latencies.append(time.perf_counter() - t)
+        crc = zlib.crc32(repr(result).encode(), crc)
+
+    replay(path, on_tx=on_tx, on_rx=on_rx, speed=speed)
+
+    if not latencies:
+        return {"messages": 0}
+
+    latencies.sort()
+    return {
+        "messages": len(latencies),
+        "total_ms": sum(latencies) * 1000,
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+        "max_us": latencies[-1] * 1e6,
+        "crc": f"{crc:08x}",
+    }
+
+
+class FlowReplay:
+    """Re-run the flow engine over a recorded conversation.
+
+    Recorded commands decide which flow runs on each device: a READ starts
+    a read of that register, and the lock code starts lock → WAIT_UP →
+    settle → verify against the value last written. Responses are then fed
+    to that device's run on the recorded clock. Commands the run issues
+    itself (the lock, the verify read) are already in the log, so while a
+    run is active a READ it is about to send does not start a new one.
+    """
+
+    BY_WRITE = {r.write: r for r in WRITABLE.values()}
+
+    def __init__(self):
+        self.runs = {}        # device -> active FlowRun
+        self.written = {}     # device -> (Register, value) of the last write
+        self.outcomes = {}    # (flow name, outcome) -> count
+
+    @staticmethod
+    def _device(topic):
+        return topic.split("/")[3]
+
+    def _finish(self, device, run):
+        del self.runs[device]
+        key = (run.flow.name, run.outcome)
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+        return run.flow.name, run.outcome, run.results
+
+    def _start(self, device, run, ts):
+        self.runs[device] = run
+        run.advance(ts)     # issues its first command at the recorded time
+
+    def on_tx(self, ts, topic, cmd):
+        device = self._device(topic)
+        run = self.runs.get(device)
+        if run is not None:
+            run.advance(ts)
+            if run.finished:
+                self._finish(device, run)
+                run = None
+
+        address = read_register_of(cmd)
+        if address is not None:
+            reg = BY_ADDRESS.get(address)
+            if reg is not None and run is None:
+                self._start(device, FlowRun(read_flow(reg.name)), ts)
+            return
+
+        if cmd == lock_command():
+            if device in self.written:
+                reg, value = self.written.pop(device)
+                self._start(device, FlowRun(apply_flow(reg.name), value=value), ts)
+            return
+
+        # UP#,<write address>:<raw>
+        address, _, raw = cmd.partition(",")[2].partition(":")
+        reg = self.BY_WRITE.get(address)
+        if reg is not None and raw.isdigit():
+            self.written[device] = (reg, int(raw) // reg.write_scale)
+
+    def on_rx(self, ts, topic, payload):
+        device = self._device(topic)
+        run = self.runs.get(device)
+        if run is None:
+            return None
+
+        run.feed(ts, payload)
+        run.advance(ts)
+        if run.finished:
+            return self._finish(device, run)
+        return run.flow.name, run.index
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ("info", "bench"):
+        print(__doc__)
+        return 2
+
+    command, path = argv[0], argv[1]
+
+    if command == "info":
+        counts = {TX: 0, RX: 0}
+        first = last = None
+        for ts, direction, _, _ in read_records(path):
+            counts[direction] += 1
+            first = ts if first is None else first
+            last = ts
+        span = (last - first) if first is not None else 0.0
+        print(f"{counts[TX]} TX · {counts[RX]} RX · {span:.1f} s")
+        return 0
+
+    speed = 1.0 if "--realtime" in argv else None
+
+    flows = FlowReplay() if "--flow" in argv else None
+    if flows:
+        stats = benchmark(path, flows.on_rx, speed=speed, on_tx=flows.on_tx)
+    else:
+        from inverter_protocol import parse_registers
+        stats = benchmark(path, lambda ts, topic, payload: parse_registers(payload), speed=speed)
+
+    for k, v in stats.items():
+        print(f"{k:>10}: {v:.1f}" if isinstance(v, float) else f"{k:>10}: {v}")
+    if flows:
+        for (name, outcome), count in sorted(flows.outcomes.items()):
+            print(f"{name:>24} {outcome:<9} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,445 @@
+import glob
+import json
+import os
+import queue
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from flow_engine import MISMATCH, VERIFIED as FLOW_VERIFIED, FlowRun, apply_flow, verify_flow, write_flow
+from inverter_protocol import device_address, device_label
+from register_catalog import WRITABLE
+from traffic_recorder import RX, TX, record as record_traffic
+
+JOURNAL_DIR = "write_journals"
+
+CONNECT_TIMEOUT = 10
+MAX_WORKERS = 8
+POLL = 0.1           # s between flow ticks while waiting on a device
+
+# journal steps
+JOB = "JOB"
+UNLOCK = "UNLOCK"
+WRITE = "WRITE"
+LOCK = "LOCK"
+VERIFIED = "VERIFIED"
+FAILED = "FAILED"
+
+
+# =====================================================
+# WRITE-AHEAD JOURNAL
+# =====================================================
+class WriteJournal:
+    """Append-only JSON-lines file, one record per device step.
+
+    Every record is flushed and fsync'd *before* the matching command is
+    published, so after a crash the journal never lags behind the device.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, step, device=None, **fields):
+        record = {"ts": time.time(), "step": step, "device": device, **fields}
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return record
+
+    def repair(self):
+        """Cut a torn last line left by a crash, so the next append starts
+        on a fresh line instead of being glued onto (and lost with) it."""
+        if not os.path.exists(self.path):
+            return
+
+        with self._lock, open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+
+            # walk back to the end of the last complete record
+            end = 0
+            pos = size
+            while pos > 0:
+                chunk = min(4096, pos)
+                pos -= chunk
+                f.seek(pos)
+                i = f.read(chunk).rfind(b"\n")
+                if i >= 0:
+                    end = pos + i + 1
+                    break
+
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # torn last line after a crash → ignore
+                    continue
+
+    def replay(self):
+        """(JOB header, last record per device, last job-level failure)."""
+        header = None
+        last_step = {}
+        job_error = None
+
+        for record in self.records():
+            if record["step"] == JOB:
+                header = record
+            elif record.get("device"):
+                last_step[record["device"]] = record
+            elif record["step"] == FAILED:
+                job_error = record
+
+        return header, last_step, job_error
+
+
+# =====================================================
+# JOB ENGINE
+# =====================================================
+class BulkWriteJob:
+    """Unlock → write → lock → verify across many devices, resumable.
+
+    On resume, devices whose last journal step is VERIFIED are skipped and
+    every other device that has journal entries is read back first; it is
+    only rewritten if the register does not already hold the target value.
+    """
+
+    def __init__(self, path):
+        self.journal = WriteJournal(path)
+        self.journal.repair()
+        header, last_step, job_error = self.journal.replay()
+        if header is None:
+            raise ValueError(f"{path} is not a write job journal")
+
+        self.job_id = header["job"]
+        self.setting = header["setting"]
+        self.value = header["value"]
+        self.devices = header["devices"]
+        self.meta = header.get("meta", {})
+
+        self.register = WRITABLE[self.setting]
+
+        self.status = {d: r["step"] for d, r in last_step.items()}
+        self.details = dict(last_step)
+        self.latency = {}     # device -> seconds for this run's sequence
+
+        self.password = None
+        self.running = False
+        # job-level failure (e.g. broker unreachable), not tied to a device
+        self.last_error = job_error and job_error.get("reason")
+        self.last_error_at = job_error and job_error.get("ts")
+        self.started_at = None
+        self.finished_at = None
+
+        self._clients = {}    # broker host -> client
+        self._stop = threading.Event()
+        self._stop_reason = None
+        self._inboxes = {d: queue.Queue() for d in self.devices}
+        self._lock = threading.Lock()
+        self._limiter = nullcontext()
+
+    @classmethod
+    def create(cls, setting, value, devices, **meta):
+        if setting not in WRITABLE:
+            raise ValueError(f"unknown setting {setting!r}")
+
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        path = os.path.join(JOURNAL_DIR, f"{job_id}.jsonl")
+
+        WriteJournal(path).append(
+            JOB, job=job_id, setting=setting, value=value, devices=list(devices), meta=meta
+        )
+        return cls(path)
+
+    @property
+    def path(self):
+        return self.journal.path
+
+    # -------------------------------------------------
+    # progress
+    # -------------------------------------------------
+    def pending(self):
+        return [d for d in self.devices if self.status.get(d) != VERIFIED]
+
+    def summary(self):
+        counts = {"PENDING": 0}
+        for d in self.devices:
+            step = self.status.get(d, "PENDING")
+            counts[step] = counts.get(step, 0) + 1
+        return counts
+
+    def report(self):
+        """Outcome and per-device latency of the current/last run."""
+        summary = self.summary()
+        latencies = sorted(self.latency.values())
+        report = {
+            "job": self.job_id,
+            "setting": self.setting,
+            "value": self.value,
+            "devices": len(self.devices),
+            "verified": summary.get(VERIFIED, 0),
+            "failed": summary.get(FAILED, 0),
+            "started_at": self.started_at,
+            "duration_s": ((self.finished_at or time.time()) - self.started_at) if self.started_at else None,
+            **self.meta,
+        }
+        if latencies:
+            report["p50_s"] = statistics.median(latencies)
+            report["p95_s"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            report["max_s"] = latencies[-1]
+        return report
+
+    def _log(self, device, step, **fields):
+        record = self.journal.append(step, device, job=self.job_id, **fields)
+        with self._lock:
+            self.status[device] = step
+            self.details[device] = record
+
+    # -------------------------------------------------
+    # mqtt
+    # -------------------------------------------------
+    def _connect(self):
+        """One client per broker the job's devices live on."""
+        by_broker = {}
+        for d in self.devices:
+            broker, address = device_address(d)
+            by_broker.setdefault(broker["host"], (broker, []))[1].append(address)
+
+        waits = []
+        for host, (broker, addresses) in by_broker.items():
+            connected = threading.Event()
+            self._clients[host] = self._connect_broker(broker, addresses, connected)
+            waits.append((host, connected))
+
+        for host, connected in waits:
+            if not connected.wait(CONNECT_TIMEOUT):
+                raise ConnectionError(f"no CONNACK from {host}")
+
+    def _connect_broker(self, broker, addresses, connected):
+        topics = [(f"/AC/5/{a}/Response", 1) for a in addresses]
+        inboxes = self._inboxes
+
+        import paho.mqtt.client as mqtt
+
+        client = mqtt.Client()
+
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                client.subscribe(topics)
+                connected.set()
+
+        def on_message(client, userdata, msg):
+            record_traffic(RX, msg.topic, msg.payload)
+            device = device_label(broker, msg.topic.split("/")[3])
+            inbox = inboxes.get(device)
+            if inbox is not None:
+                inbox.put((time.time(), msg.payload.decode(errors="ignore")))
+
+        client.on_connect = on_connect
+        client.on_message = on_message
+        client.connect(broker["host"], broker["port"], 60)
+        client.loop_start()
+        return client
+
+    def _publish(self, device, cmd):
+        broker, address = device_address(device)
+        topic = f"/AC/5/{address}/Command"
+        record_traffic(TX, topic, cmd)
+        self._clients[broker["host"]].publish(topic, cmd, qos=1)
+
+    def _drive(self, device, run):
+        """Tick `run` against this device's inbox until it finishes.
+
+        UNLOCK/WRITE/LOCK are journaled before their command is published.
+        """
+        inbox = self._inboxes[device]
+
+        while True:
+            for step, cmd in run.advance(time.time()):
+                if step.kind == UNLOCK:
+                    self._log(device, UNLOCK)
+                elif step.kind == WRITE:
+                    self._log(device, WRITE, register=step.register.write, raw=step.register.raw(self.value))
+                elif step.kind == LOCK:
+                    self._log(device, LOCK)
+                self._publish(device, cmd)
+
+            if run.finished:
+                return run
+
+            try:
+                run.feed(*inbox.get(timeout=POLL))
+                while True:
+                    run.feed(*inbox.get_nowait())
+            except queue.Empty:
+                pass
+
+    # -------------------------------------------------
+    # per-device sequence
+    # -------------------------------------------------
+    def _run_device(self, device):
+        previous = self.status.get(device)
+        if previous == VERIFIED:
+            return
+
+        # uncertain from an interrupted run → re-verify before rewriting;
+        # interrupted before LOCK → the device may still be unlocked, lock first
+        if previous is not None:
+            flow = apply_flow(self.setting) if previous in (UNLOCK, WRITE) else verify_flow(self.setting)
+            run = self._drive(device, FlowRun(flow, value=self.value))
+            if run.outcome == FLOW_VERIFIED:
+                self._log(device, VERIFIED, value=self.value, resumed=True)
+                return
+
+        run = self._drive(
+            device, FlowRun(write_flow(self.setting), value=self.value, password=self.password)
+        )
+
+        if run.outcome == FLOW_VERIFIED:
+            self._log(device, VERIFIED, value=self.value)
+        elif run.outcome == MISMATCH:
+            self._log(device, FAILED, reason="mismatch", value=run.results.get(self.setting))
+        else:
+            self._log(device, FAILED, reason=run.reason)
+
+    def _timed_device(self, device):
+        with self._limiter:
+            if self._stop.is_set():
+                return      # never started; stays pending
+            t0 = time.time()
+            try:
+                self._run_device(device)
+            finally:
+                self.latency[device] = time.time() - t0
+
+    def _run(self, max_workers, spread):
+        try:
+            self._connect()
+
+            # stagger starts over `spread` seconds instead of all at once
+            due = sorted(
+                (random.uniform(0, spread) if spread else 0.0, d) for d in self.pending()
+            )
+            t0 = time.time()
+
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = []
+                for offset, device in due:
+                    delay = t0 + offset - time.time()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                    if self._stop.is_set():
+                        break
+                    futures.append(pool.submit(self._timed_device, device))
+                for f in futures:
+                    f.result()
+
+            if self._stop.is_set():
+                record = self.journal.append(FAILED, job=self.job_id, reason=f"stopped: {self._stop_reason}")
+                self.last_error = record["reason"]
+                self.last_error_at = record["ts"]
+        except Exception as e:
+            record = self.journal.append(FAILED, job=self.job_id, reason=f"{type(e).__name__}: {e}")
+            self.last_error = record["reason"]
+            self.last_error_at = record["ts"]
+        finally:
+            for client in self._clients.values():
+                client.loop_stop()
+                client.disconnect()
+            self._clients = {}
+            self.running = False
+            self.finished_at = time.time()
+
+    def start(self, password, max_workers=MAX_WORKERS, spread=0.0, limiter=None, on_done=None):
+        """Run pending devices in a background thread.
+
+        `spread` staggers device starts uniformly over that many seconds;
+        `limiter` (a semaphore) caps concurrent sequences across jobs;
+        `on_done(job)` is called from the job thread when it finishes.
+        """
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+
+        self.password = password
+        self._stop.clear()
+        self._stop_reason = None
+        self.last_error = None
+        self.last_error_at = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.latency = {}
+        self._limiter = limiter or nullcontext()
+
+        def run():
+            self._run(max_workers, spread)
+            if on_done is not None:
+                on_done(self)
+
+        threading.Thread(target=run, name=f"write-job-{self.job_id}", daemon=True).start()
+
+    def stop(self, reason="stopped"):
+        """Start no further devices. Sequences already in flight run to the
+        end (a device is never left between unlock and lock); the job is
+        finished once `running` is False."""
+        self._stop_reason = reason
+        self._stop.set()
+
+
+# =====================================================
+# PROCESS-WIDE JOB REGISTRY
+# =====================================================
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def list_journals():
+    return sorted(glob.glob(os.path.join(JOURNAL_DIR, "*.jsonl")), reverse=True)
+
+
+def read_header(path):
+    """JOB record of a journal without replaying its device steps."""
+    with open(path, encoding="utf-8") as f:
+        try:
+            record = json.loads(f.readline())
+        except ValueError:
+            return None
+    return record if record.get("step") == JOB else None
+
+
+def get_job(path):
+    with _jobs_lock:
+        if path not in _jobs:
+            _jobs[path] = BulkWriteJob(path)
+        return _jobs[path]
+
+
+def create_job(setting, value, devices, **meta):
+    job = BulkWriteJob.create(setting, value, devices, **meta)
+    with _jobs_lock:
+        _jobs[job.path] = job
+    return job